@@ -25,31 +25,62 @@ def find_database():
 
 
 def analyze_missing(con):
-    """Profile all fields for missing values."""
-    df = con.execute(
-        "SELECT * FROM observations"
-    ).fetchdf()
-
-    print(f"Total observations: {len(df):,}")
-    print(f"Satellites:         "
-          f"{df.sat_no.nunique()}")
-    print(f"Sensors:            "
-          f"{df.sensor_name.nunique()}")
+    """Profile all fields for missing values.
+
+    Null counts come from a single COUNT(*) vs
+    COUNT(col) aggregate; only the one-row
+    summary is fetched.
+
+    Returns:
+        DataFrame indexed by column with
+        n_missing and pct
+    """
+    cols = [r[0] for r in con.execute("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = 'observations'
+        ORDER BY ordinal_position
+    """).fetchall()]
+
+    n_sats, n_sensors, t_min, t_max, n_obs = (
+        con.execute("""
+            SELECT COUNT(DISTINCT sat_no),
+                   COUNT(DISTINCT sensor_name),
+                   MIN(ob_time), MAX(ob_time),
+                   COUNT(*)
+            FROM observations
+        """).fetchone()
+    )
+    print(f"Total observations: {n_obs:,}")
+    print(f"Satellites:         {n_sats}")
+    print(f"Sensors:            {n_sensors}")
     print(f"Time range:         "
-          f"{df.ob_time.min()} → "
-          f"{df.ob_time.max()}")
+          f"{t_min} → {t_max}")
+
+    counts = con.execute(
+        "SELECT COUNT(*), " +
+        ", ".join(f'COUNT("{c}")' for c in cols) +
+        " FROM observations"
+    ).fetchone()
+    total = counts[0]
+    missing = pd.DataFrame(
+        {"n_missing": [total - n for n in counts[1:]]},
+        index=cols
+    )
+    missing["pct"] = (
+        missing["n_missing"] / total * 100
+        if total else 0.0
+    )
 
     print("\n--- MISSING VALUES PER FIELD ---")
-    for col in df.columns:
-        n_missing = df[col].isna().sum()
-        pct = n_missing / len(df) * 100
-        print(f"  {col:<25} {n_missing:>6} "
-              f"({pct:>6.1f}%)")
+    for row in missing.itertuples():
+        print(f"  {row.Index:<25} {row.n_missing:>6} "
+              f"({row.pct:>6.1f}%)")
 
-    return df
+    return missing
 
 
-def classify_missing(df):
+def classify_missing(missing):
     """
     Classify missing data mechanism:
     MCAR = Missing Completely At Random
@@ -73,8 +104,7 @@ def classify_missing(df):
         },
         "track_id": {
             "pct": round(
-                df.track_id.isna().sum() /
-                len(df) * 100, 1
+                missing.loc["track_id", "pct"], 1
             ),
             "type": "MAR",
             "reason": "Observations not yet grouped",
@@ -92,16 +122,21 @@ def classify_missing(df):
     return decisions
 
 
-def identify_sparse_satellites(df, threshold=100):
+def identify_sparse_satellites(con, threshold=100):
     """Find satellites with insufficient coverage."""
     print("\n--- SPARSE SATELLITES ---")
-    counts = df.groupby("sat_no").size()
-    sparse = counts[counts < threshold]
-
-    for sat, count in sparse.items():
+    sparse = con.execute("""
+        SELECT sat_no, COUNT(*) AS n_obs
+        FROM observations
+        GROUP BY sat_no
+        HAVING COUNT(*) < ?
+        ORDER BY sat_no
+    """, [threshold]).fetchall()
+
+    for sat, count in sparse:
         print(f"  sat {sat}: {count} observations")
 
-    return sparse.index.tolist()
+    return [sat for sat, _ in sparse]
 
 
 if __name__ == "__main__":
@@ -112,9 +147,9 @@ if __name__ == "__main__":
     print("DATA QUALITY ANALYSIS")
     print("=" * 55)
 
-    df = analyze_missing(con)
-    decisions = classify_missing(df)
-    sparse = identify_sparse_satellites(df)
+    missing = analyze_missing(con)
+    decisions = classify_missing(missing)
+    sparse = identify_sparse_satellites(con)
 
     print(f"\nSparse satellites: {sparse}")
     print("\nDone ✅")
@@ -87,185 +87,213 @@ def build_tracks(df_eo):
     df_eo["range"]  = pd.to_numeric(
         df_eo["range"], errors="coerce"
     )
-    df_eo["track_id"]   = None
-    df_eo["range_rate"] = np.nan
-
-    track_counter = 1
-    track_stats   = []
-
-    for sat in df_eo["satNo"].unique():
-        for sensor in df_eo[
-            df_eo["satNo"] == sat
-        ]["idSensor"].unique():
-            mask   = (
-                (df_eo["satNo"] == sat) &
-                (df_eo["idSensor"] == sensor)
-            )
-            sen_df = df_eo[mask].sort_values("obTime")
-            track     = []
-            prev_time = None
-
-            for idx, row in sen_df.iterrows():
-                t = row["obTime"]
-                if prev_time is None:
-                    track = [idx]
-                else:
-                    gap = (t - prev_time).total_seconds()
-                    if gap <= 120:
-                        track.append(idx)
-                    else:
-                        if track:
-                            tid = f"TRK{track_counter:06d}"
-                            df_eo.loc[track, "track_id"] = tid
-                            ts = df_eo.loc[track[0],  "obTime"]
-                            te = df_eo.loc[track[-1], "obTime"]
-                            track_stats.append({
-                                "track_id": tid,
-                                "sat_no":   sat,
-                                "sensor":   sensor,
-                                "n_obs":    len(track),
-                                "start":    ts,
-                                "end":      te,
-                                "duration": (te-ts).total_seconds()
-                            })
-                            track_counter += 1
-                        track = [idx]
-                prev_time = t
-
-            if track:
-                tid = f"TRK{track_counter:06d}"
-                df_eo.loc[track, "track_id"] = tid
-                ts = df_eo.loc[track[0],  "obTime"]
-                te = df_eo.loc[track[-1], "obTime"]
-                track_stats.append({
-                    "track_id": tid,
-                    "sat_no":   sat,
-                    "sensor":   sensor,
-                    "n_obs":    len(track),
-                    "start":    ts,
-                    "end":      te,
-                    "duration": (te-ts).total_seconds()
-                })
-                track_counter += 1
+
+    # New track whenever sat/sensor changes or the
+    # gap to the previous obs exceeds 120s. Obs with
+    # no sensor belong to no track (track_id None)
+    srt = df_eo[df_eo["idSensor"].notna()].sort_values(
+        ["satNo", "idSensor", "obTime"]
+    )
+    grp_change = (
+        (srt["satNo"] != srt["satNo"].shift()) |
+        (srt["idSensor"] != srt["idSensor"].shift())
+    )
+    dt = srt["obTime"].diff().dt.total_seconds()
+    new_track = (grp_change | (dt > 120)).to_numpy()
+    track_ids = (
+        "TRK" + pd.Series(
+            new_track.cumsum(), index=srt.index
+        ).astype(str).str.zfill(6)
+    )
+    df_eo["track_id"] = track_ids.astype(object)
 
     # Calculate range rate
-    for sat in df_eo["satNo"].unique():
-        mask   = df_eo["satNo"] == sat
-        sat_df = df_eo[mask].sort_values("obTime")
-        rates  = np.full(len(sat_df), np.nan)
-        for i in range(1, len(sat_df)):
-            dt = (
-                sat_df["obTime"].iloc[i] -
-                sat_df["obTime"].iloc[i-1]
-            ).total_seconds()
-            if 0 < dt <= 120:
-                dr = (sat_df["range"].iloc[i] -
-                      sat_df["range"].iloc[i-1])
-                rate = dr / dt
-                if abs(rate) <= 8:
-                    rates[i] = rate
-        df_eo.loc[mask, "range_rate"] = rates
-
-    df_tracks = pd.DataFrame(track_stats)
-    if len(df_tracks) > 0:
-        df_tracks["start"] = pd.to_datetime(
-            df_tracks["start"]
-        )
-        df_tracks["end"] = pd.to_datetime(
-            df_tracks["end"]
-        )
+    by_sat = df_eo.sort_values(
+        ["satNo", "obTime"]
+    ).groupby("satNo", sort=False)
+    dt     = by_sat["obTime"].diff().dt.total_seconds()
+    rate   = by_sat["range"].diff() / dt
+    df_eo["range_rate"] = rate.where(
+        (dt > 0) & (dt <= 120) & (rate.abs() <= 8)
+    )
+
+    # Tracks are contiguous runs of srt, so the
+    # summary is read off the run boundaries
+    bounds = np.append(
+        np.flatnonzero(new_track), len(srt)
+    )
+    first, last = bounds[:-1], bounds[1:] - 1
+    df_tracks = pd.DataFrame({
+        "track_id": track_ids.array[first],
+        "sat_no":   srt["satNo"].array[first],
+        "sensor":   srt["idSensor"].array[first],
+        "n_obs":    np.diff(bounds),
+        "start":    srt["obTime"].array[first],
+        "end":      srt["obTime"].array[last]
+    })
+    df_tracks["duration"] = (
+        df_tracks["end"] - df_tracks["start"]
+    ).dt.total_seconds()
     return df_eo, df_tracks
 
 
 # ─────────────────────────────────────────────────
 # EVENT DETECTION
 # ─────────────────────────────────────────────────
+def sparse_and_single_obs(con):
+    """Sparse satellites (Event 1) and single-obs
+    tracks (Event 2) from one DuckDB query over the
+    registered eo/tr views. Only the flagged rows
+    are fetched."""
+    return con.execute("""
+        WITH sc AS (
+            SELECT satNo, COUNT(*) AS n_obs,
+                   MIN(obTime) AS first
+            FROM eo
+            GROUP BY satNo
+        )
+        SELECT 'SPARSE_OBJECT' AS event_type,
+               satNo AS sat_no, first AS event_time,
+               'N/A' AS track_id, n_obs,
+               NULL AS sensor
+        FROM sc
+        WHERE n_obs < ?
+        UNION ALL
+        SELECT 'SINGLE_OBS_TRACK', sat_no, start,
+               track_id, n_obs, sensor
+        FROM tr
+        WHERE n_obs = 1
+        ORDER BY event_type DESC, sat_no, event_time
+    """, [SPARSE_THRESHOLD]).fetchdf()
+
+
+def track_transitions(con):
+    """Pair each track with the previous track of the
+    same satellite (60s-2h apart) and compare the
+    median range_rate of the last 3 obs of the first
+    with the first 3 obs of the second. Runs as one
+    DuckDB query over the registered eo/tr views."""
+    return con.execute("""
+        WITH ranked AS (
+            SELECT track_id, range_rate,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY track_id
+                       ORDER BY obTime DESC
+                   ) AS rn_end,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY track_id
+                       ORDER BY obTime
+                   ) AS rn_start
+            FROM eo
+        ),
+        rr AS (
+            SELECT track_id,
+                   MEDIAN(range_rate) FILTER (
+                       WHERE rn_end <= 3
+                   ) AS end_rr,
+                   MEDIAN(range_rate) FILTER (
+                       WHERE rn_start <= 3
+                   ) AS start_rr
+            FROM ranked
+            GROUP BY track_id
+        ),
+        adj AS (
+            SELECT sat_no, track_id, start,
+                   LAG(track_id) OVER w AS prev_id,
+                   epoch(start - LAG("end") OVER w)
+                       AS gap
+            FROM tr
+            WINDOW w AS (
+                PARTITION BY sat_no ORDER BY start
+            )
+        )
+        SELECT adj.sat_no, adj.track_id, adj.start,
+               adj.gap,
+               ABS(cur.start_rr - prev.end_rr)
+                   AS delta_rr
+        FROM adj
+        JOIN rr cur  ON cur.track_id  = adj.track_id
+        JOIN rr prev ON prev.track_id = adj.prev_id
+        WHERE adj.gap BETWEEN 60 AND 7200
+          AND cur.start_rr IS NOT NULL
+          AND prev.end_rr  IS NOT NULL
+        ORDER BY adj.sat_no, adj.start
+    """).fetchdf()
+
+
 def label_events(df_eo, df_tracks, df_conj):
     """Run all 5 event detection methods."""
-    all_events = []
+    events = {
+        "sat_no": [], "event_type": [],
+        "event_time": [], "track_id": [],
+        "confidence": [], "source": [], "details": []
+    }
 
     def add(sat_no, event_type, event_time,
             track_id, confidence, source, details):
-        all_events.append({
-            "id":         str(uuid.uuid4()),
-            "sat_no":     int(sat_no),
-            "event_type": event_type,
-            "event_time": str(event_time),
-            "track_id":   str(track_id),
-            "confidence": float(confidence),
-            "source":     source,
-            "details":    str(details),
-            "created_at": datetime.now(
-                timezone.utc
-            ).isoformat()
-        })
+        events["sat_no"].append(sat_no)
+        events["event_type"].append(event_type)
+        events["event_time"].append(str(event_time))
+        events["track_id"].append(str(track_id))
+        events["confidence"].append(confidence)
+        events["source"].append(source)
+        events["details"].append(str(details))
+
+    con = duckdb.connect()
+    # Fetched TIMESTAMPTZ values are localized to the
+    # session time zone; pin it so event times stay UTC
+    con.execute("SET TimeZone = 'UTC'")
+    con.register("eo", df_eo[
+        ["satNo", "obTime", "track_id", "range_rate"]
+    ])
+    con.register("tr", df_tracks[
+        ["track_id", "sat_no", "sensor",
+         "n_obs", "start", "end"]
+    ])
 
     # Event 1 — Sparse objects
-    sat_counts = df_eo.groupby(
-        "satNo"
-    ).size().reset_index(name="n_obs")
-    for _, row in sat_counts[
-        sat_counts["n_obs"] < SPARSE_THRESHOLD
-    ].iterrows():
-        first = df_eo[
-            df_eo["satNo"] == row["satNo"]
-        ]["obTime"].min()
-        add(row["satNo"], "SPARSE_OBJECT", first,
-            "N/A", 1.0, "COMPUTED",
-            {"n_obs": int(row["n_obs"]),
-             "threshold": SPARSE_THRESHOLD})
-
     # Event 2 — Single obs tracks
-    for _, row in df_tracks[
-        df_tracks["n_obs"] == 1
-    ].iterrows():
-        add(row["sat_no"], "SINGLE_OBS_TRACK",
-            str(row["start"]), row["track_id"],
-            0.7, "COMPUTED",
-            {"reason": "only 1 observation",
-             "sensor": row["sensor"]})
+    for row in sparse_and_single_obs(
+        con
+    ).itertuples(index=False):
+        if row.event_type == "SPARSE_OBJECT":
+            add(row.sat_no, "SPARSE_OBJECT",
+                row.event_time, "N/A", 1.0, "COMPUTED",
+                {"n_obs": int(row.n_obs),
+                 "threshold": SPARSE_THRESHOLD})
+        else:
+            add(row.sat_no, "SINGLE_OBS_TRACK",
+                str(row.event_time), row.track_id,
+                0.7, "COMPUTED",
+                {"reason": "only 1 observation",
+                 "sensor": row.sensor})
 
     # Event 3 — Maneuvers
-    for sat in df_eo["satNo"].unique():
-        sat_tr = df_tracks[
-            df_tracks["sat_no"] == sat
-        ].sort_values("start").reset_index(drop=True)
-        if len(sat_tr) < 2:
-            continue
-        for i in range(1, len(sat_tr)):
-            t1  = sat_tr.iloc[i-1]
-            t2  = sat_tr.iloc[i]
-            gap = (
-                t2["start"] - t1["end"]
-            ).total_seconds()
-            if gap < 60 or gap > 7200:
-                continue
-            end_rr = df_eo[
-                df_eo["track_id"] == t1["track_id"]
-            ].tail(3)["range_rate"].median()
-            start_rr = df_eo[
-                df_eo["track_id"] == t2["track_id"]
-            ].head(3)["range_rate"].median()
-            if pd.isna(end_rr) or pd.isna(start_rr):
-                continue
-            delta = abs(start_rr - end_rr)
-            if delta > MANEUVER_THRESHOLD:
-                add(sat, "MANEUVER",
-                    str(t2["start"]),
-                    t2["track_id"],
-                    min(0.5 + delta*0.1, 0.95),
-                    "COMPUTED",
-                    {"delta_range_rate": round(
-                        float(delta), 4),
-                     "gap_seconds": round(gap, 1)})
+    for row in track_transitions(
+        con
+    ).itertuples(index=False):
+        delta = row.delta_rr
+        if delta > MANEUVER_THRESHOLD:
+            add(row.sat_no, "MANEUVER",
+                str(row.start),
+                row.track_id,
+                min(0.5 + delta*0.1, 0.95),
+                "COMPUTED",
+                {"delta_range_rate": round(
+                    float(delta), 4),
+                 "gap_seconds": round(row.gap, 1)})
+    con.close()
 
     # Event 4 — Conjunctions
-    for _, row in df_conj.iterrows():
+    df_conj = df_conj.rename(
+        columns=lambda c: c.replace("-", "_")
+    )
+    for row in df_conj.itertuples(index=False):
         try:
-            sat1 = int(row["satNo1"]) \
-                   if pd.notna(row["satNo1"]) else None
-            sat2 = int(row["satNo2"]) \
-                   if pd.notna(row["satNo2"]) else None
+            sat1 = int(row.satNo1) \
+                   if pd.notna(row.satNo1) else None
+            sat2 = int(row.satNo2) \
+                   if pd.notna(row.satNo2) else None
         except Exception:
             continue
         matched = None
@@ -275,44 +303,60 @@ def label_events(df_eo, df_tracks, df_conj):
             matched = sat2
         if matched is None:
             continue
-        dist = float(row["missDistance"]) \
-               if pd.notna(row.get("missDistance")) \
+        dist = float(row.missDistance) \
+               if pd.notna(getattr(
+                   row, "missDistance", None)) \
                else 999.0
         conf = (0.99 if dist < 1   else
                 0.85 if dist < 10  else
                 0.60 if dist < 100 else 0.30)
         add(matched, "CONJUNCTION",
-            str(row.get("tca", "")),
+            str(getattr(row, "tca", "")),
             "N/A", conf, "UDL",
             {"sat1": sat1, "sat2": sat2,
              "missDistance": round(dist, 3)})
 
     # Event 5 — Track gaps
-    for sat in df_eo["satNo"].unique():
-        sat_df = df_eo[
-            df_eo["satNo"] == sat
-        ].sort_values("obTime").reset_index(drop=True)
-        if len(sat_df) < 2:
-            continue
-        total_hrs = (
-            sat_df["obTime"].max() -
-            sat_df["obTime"].min()
-        ).total_seconds() / 3600
-        if total_hrs < GAP_THRESHOLD_HRS:
-            continue
-        for i in range(1, len(sat_df)):
-            gap_hrs = (
-                sat_df["obTime"].iloc[i] -
-                sat_df["obTime"].iloc[i-1]
-            ).total_seconds() / 3600
-            if gap_hrs >= GAP_THRESHOLD_HRS:
-                add(sat, "TRACK_GAP",
-                    str(sat_df["obTime"].iloc[i-1]),
-                    "N/A", 0.6, "COMPUTED",
-                    {"gap_hours": round(gap_hrs, 2),
-                     "threshold": GAP_THRESHOLD_HRS})
-
-    return pd.DataFrame(all_events)
+    sat_time  = df_eo.sort_values(["satNo", "obTime"])
+    prev_time = sat_time.groupby(
+        "satNo"
+    )["obTime"].shift()
+    gap_hrs = (
+        sat_time["obTime"] - prev_time
+    ).dt.total_seconds() / 3600
+    gap_mask = gap_hrs >= GAP_THRESHOLD_HRS
+    for row in sat_time.loc[gap_mask, ["satNo"]].assign(
+        prev_time=prev_time[gap_mask],
+        gap_hours=gap_hrs[gap_mask]
+    ).itertuples(index=False):
+        add(row.satNo, "TRACK_GAP",
+            str(row.prev_time),
+            "N/A", 0.6, "COMPUTED",
+            {"gap_hours": round(row.gap_hours, 2),
+             "threshold": GAP_THRESHOLD_HRS})
+
+    # Events are emitted together: one timestamp and
+    # one batch of ids for the whole run. The low
+    # cardinality labels go in as categoricals so the
+    # events table stores them dictionary-encoded
+    n_events   = len(events["sat_no"])
+    created_at = datetime.now(timezone.utc).isoformat()
+    return pd.DataFrame({
+        "id":         [str(uuid.uuid4())
+                       for _ in range(n_events)],
+        "sat_no":     np.asarray(
+            events["sat_no"], dtype=np.int64),
+        "event_type": pd.Categorical(
+            events["event_type"]),
+        "event_time": events["event_time"],
+        "track_id":   events["track_id"],
+        "confidence": np.asarray(
+            events["confidence"], dtype=np.float64),
+        "source":     pd.Categorical(
+            events["source"]),
+        "details":    events["details"],
+        "created_at": [created_at] * n_events
+    })
 
 
 # ─────────────────────────────────────────────────
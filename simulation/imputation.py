@@ -13,6 +13,7 @@ Fields filled:
 import duckdb
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import os
 
 
@@ -29,17 +30,18 @@ def estimate_range(elevation_deg, altitude_km=500):
 
     Args:
         elevation_deg: elevation angle in degrees
+                       (scalar or array)
         altitude_km:   assumed satellite altitude
 
     Returns:
-        range in km
+        range in km (same shape as elevation_deg)
     """
     R = 6371.0
-    el_rad = np.radians(elevation_deg)
+    r_sin = R * np.sin(np.radians(elevation_deg))
     return (
-        -R * np.sin(el_rad) +
+        -r_sin +
         np.sqrt(
-            (R * np.sin(el_rad))**2 +
+            r_sin**2 +
             altitude_km**2 +
             2 * R * altitude_km
         )
@@ -48,28 +50,45 @@ def estimate_range(elevation_deg, altitude_km=500):
 
 def calculate_range_rate(ranges_km, times,
                           max_rate=8.0,
-                          max_gap_sec=120):
+                          max_gap_sec=120,
+                          groups=None):
     """
     Calculate range rate from consecutive observations.
 
+    Single pass over the arrays: pairs that straddle
+    a group boundary, exceed max_gap_sec or the
+    physical rate limit are left as NaN.
+
     Args:
         ranges_km:    array of range values
         times:        list of datetime objects
         max_rate:     physical limit for LEO (km/s)
         max_gap_sec:  max time gap between obs
+        groups:       optional per-obs group key (e.g.
+                      sat_no); rows must be sorted by
+                      group then time
 
     Returns:
-        array of range_rate values (NaN for first obs)
+        array of range_rate values (NaN for first obs
+        of each group)
     """
-    rates = np.full(len(ranges_km), np.nan)
-    for i in range(1, len(ranges_km)):
-        dt = (times[i] - times[i-1]).total_seconds()
-        if 0 < dt <= max_gap_sec:
-            dr = ranges_km[i] - ranges_km[i-1]
-            rate = dr / dt
-            if abs(rate) <= max_rate:
-                rates[i] = rate
-    return rates
+    dt = pd.Series(
+        pd.to_datetime(times)
+    ).diff().dt.total_seconds().to_numpy()
+    dr = np.diff(
+        np.asarray(ranges_km, dtype=float),
+        prepend=np.nan
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = dr / dt
+    valid = (
+        (dt > 0) & (dt <= max_gap_sec) &
+        (np.abs(rates) <= max_rate)
+    )
+    if groups is not None:
+        groups = np.asarray(groups)
+        valid[1:] &= groups[1:] == groups[:-1]
+    return np.where(valid, rates, np.nan)
 
 
 def assign_track_ids(df):
@@ -83,49 +102,41 @@ def assign_track_ids(df):
         df with track_id filled
         total number of tracks
     """
-    df = df.copy().sort_values(
+    df = df.copy()
+    df["ob_time"] = pd.to_datetime(
+        df["ob_time"], cache=True
+    )
+    df = df.sort_values(
         "ob_time"
     ).reset_index(drop=True)
-    df["track_id"] = df["track_id"].astype(object)
-    track_counter = 1
-
-    for sat_no in df["sat_no"].unique():
-        sat_mask = df["sat_no"] == sat_no
-        sat_obs  = df[sat_mask]
-
-        for sensor in sat_obs["sensor_name"].unique():
-            sen_mask = sat_obs["sensor_name"] == sensor
-            sen_obs  = sat_obs[sen_mask].sort_values(
-                "ob_time"
-            )
-            current_track = []
-            prev_time     = None
-
-            for idx, row in sen_obs.iterrows():
-                curr_time = pd.to_datetime(row["ob_time"])
-                if prev_time is None:
-                    current_track = [idx]
-                else:
-                    gap = (
-                        curr_time - prev_time
-                    ).total_seconds()
-                    if gap <= 120:
-                        current_track.append(idx)
-                    else:
-                        tid = f"TRK{track_counter:06d}"
-                        for i in current_track:
-                            df.at[i, "track_id"] = tid
-                        track_counter += 1
-                        current_track = [idx]
-                prev_time = curr_time
-
-            if current_track:
-                tid = f"TRK{track_counter:06d}"
-                for i in current_track:
-                    df.at[i, "track_id"] = tid
-                track_counter += 1
-
-    return df, track_counter - 1
+
+    # New track whenever sat/sensor changes or the
+    # gap to the previous obs exceeds 120 seconds.
+    # Obs with no sensor are left out of the grouping
+    srt = df[df["sensor_name"].notna()].sort_values(
+        ["sat_no", "sensor_name", "ob_time"]
+    )
+    grp_change = (
+        (srt["sat_no"] != srt["sat_no"].shift()) |
+        (srt["sensor_name"] !=
+         srt["sensor_name"].shift())
+    )
+    gap = srt["ob_time"].diff().dt.total_seconds()
+    track_num = (grp_change | (gap > 120)).cumsum()
+
+    # df has a RangeIndex, so srt.index doubles as
+    # row positions: scatter the ids in one write.
+    # Rows without a sensor keep their track_id
+    track_ids = df["track_id"].to_numpy(
+        dtype=object, copy=True
+    )
+    track_ids[srt.index.to_numpy()] = (
+        "TRK" + track_num.astype(str).str.zfill(6)
+    ).to_numpy()
+    df["track_id"] = track_ids
+    n_tracks = int(track_num.max()) if len(srt) else 0
+
+    return df, n_tracks
 
 
 def run_imputation(con):
@@ -135,28 +146,28 @@ def run_imputation(con):
         SELECT * FROM observations
         ORDER BY sat_no, ob_time
     """).fetchdf()
+    # fetchdf() localizes to the session time zone;
+    # keep ob_time tz-aware but always in UTC
+    df["ob_time"] = pd.to_datetime(
+        df["ob_time"], utc=True, cache=True
+    )
     print(f"  {len(df):,} rows loaded")
 
     # range_km
     print("Calculating range_km...")
-    df["range_km"] = df["elevation"].apply(
-        estimate_range
+    df["range_km"] = estimate_range(
+        df["elevation"].to_numpy(dtype=float)
     )
     print(f"  Filled: {df.range_km.notna().sum():,}")
 
     # range_rate_km_s
     print("Calculating range_rate_km_s...")
-    df["range_rate_km_s"] = np.nan
-    for sat in df["sat_no"].unique():
-        mask   = df["sat_no"] == sat
-        sat_df = df[mask].copy()
-        times  = pd.to_datetime(
-            sat_df["ob_time"]
-        ).tolist()
-        rates  = calculate_range_rate(
-            sat_df["range_km"].values, times
-        )
-        df.loc[mask, "range_rate_km_s"] = rates
+    # Rows arrive ordered by sat_no, ob_time
+    df["range_rate_km_s"] = calculate_range_rate(
+        df["range_km"].to_numpy(),
+        df["ob_time"],
+        groups=df["sat_no"].to_numpy()
+    )
     filled = df.range_rate_km_s.notna().sum()
     print(f"  Filled: {filled:,} "
           f"({filled/len(df)*100:.1f}%)")
@@ -168,7 +179,14 @@ def run_imputation(con):
 
     # Save
     con.execute("DROP TABLE IF EXISTS observations_final")
-    con.register("df_final", df)
+    # Arrow ingest is zero-copy for numeric columns;
+    # track_id goes in dictionary-encoded
+    con.register("df_final", pa.Table.from_pandas(
+        df.assign(
+            track_id=df["track_id"].astype("category")
+        ),
+        preserve_index=False
+    ))
     con.execute("""
         CREATE TABLE observations_final AS
         SELECT * FROM df_final
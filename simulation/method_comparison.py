@@ -26,9 +26,10 @@ import os
 import time
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 from torch.utils.data import DataLoader, TensorDataset
-from sklearn.impute import KNNImputer
+from scipy.spatial import cKDTree
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import (
     mean_squared_error, mean_absolute_error
@@ -60,9 +61,24 @@ def load_data(con):
         SELECT ra, declination, azimuth,
                elevation, range_km, range_rate_km_s
         FROM observations_final
-        WHERE range_rate_km_s IS NOT NULL
+        WHERE ra IS NOT NULL
+        AND declination IS NOT NULL
+        AND azimuth IS NOT NULL
+        AND elevation IS NOT NULL
         AND range_km IS NOT NULL
-    """).fetchdf().dropna()
+        AND range_rate_km_s IS NOT NULL
+    """).fetchdf()
+
+
+def _pearson(true_c, true_n, preds):
+    """Pearson r against a pre-centred reference
+    (true_c) with norm true_n; avoids the 2xN stack
+    np.corrcoef builds for every call."""
+    pred_c = preds - preds.mean()
+    denom  = true_n * np.linalg.norm(pred_c)
+    if not denom:
+        return float("nan")    # as np.corrcoef
+    return float(true_c @ pred_c / denom)
 
 
 class VAE(nn.Module):
@@ -121,6 +137,8 @@ def run_comparison(con, output_dir="."):
     rr_mean = df["range_rate_km_s"].mean()
     rr_std  = df["range_rate_km_s"].std()
     true_arr = true_values.values
+    true_c   = true_arr - true_arr.mean()
+    true_n   = np.linalg.norm(true_c)
 
     scaler     = StandardScaler()
     known_mask = df_test["range_rate_km_s"].notna()
@@ -142,31 +160,36 @@ def run_comparison(con, output_dir="."):
             true_arr, mean_preds))),
         "mae": float(mean_absolute_error(
             true_arr, mean_preds)),
-        "corr": float(np.corrcoef(
-            true_arr, mean_preds)[0, 1]),
+        "corr": _pearson(true_c, true_n, mean_preds),
         "time": 0.0
     }
 
     # KNN
     print("Testing KNN (k=3)...")
     t0  = time.time()
-    knn = KNNImputer(n_neighbors=3)
-    imp = knn.fit_transform(df_scaled)
-    knn_df = pd.DataFrame(
-        imp, columns=FEATURES, index=df_test.index
+    # Only range_rate has holes, so neighbours are
+    # searched over the other features of known rows
+    pos_cols = [
+        c for c in FEATURES if c != "range_rate_km_s"
+    ]
+    known    = df_scaled[known_mask]
+    tree     = cKDTree(known[pos_cols].to_numpy())
+    _, nn_ix = tree.query(
+        df_scaled.loc[test_idx, pos_cols].to_numpy(),
+        k=3
+    )
+    knn_preds = np.clip(
+        known["range_rate_km_s"].to_numpy()[nn_ix]
+        .mean(axis=1) * rr_std + rr_mean,
+        -8, 8
     )
-    knn_preds = (
-        knn_df.loc[test_idx, "range_rate_km_s"]
-        * rr_std + rr_mean
-    ).clip(-8, 8).values
     results["KNN (k=3)"] = {
         "preds": knn_preds,
         "rmse": float(np.sqrt(mean_squared_error(
             true_arr, knn_preds))),
         "mae": float(mean_absolute_error(
             true_arr, knn_preds)),
-        "corr": float(np.corrcoef(
-            true_arr, knn_preds)[0, 1]),
+        "corr": _pearson(true_c, true_n, knn_preds),
         "time": time.time() - t0
     }
 
@@ -190,53 +213,55 @@ def run_comparison(con, output_dir="."):
             true_arr, mice_preds))),
         "mae": float(mean_absolute_error(
             true_arr, mice_preds)),
-        "corr": float(np.corrcoef(
-            true_arr, mice_preds)[0, 1]),
+        "corr": _pearson(true_c, true_n, mice_preds),
         "time": time.time() - t0
     }
 
     # VAE
     print("Testing VAE (100 epochs)...")
     t0      = time.time()
-    train_t = torch.FloatTensor(
-        df_scaled[known_mask].values
+    device  = torch.device(
+        "cuda" if torch.cuda.is_available() else "cpu"
+    )
+    train_t = torch.from_numpy(
+        df_scaled[known_mask].to_numpy(dtype=np.float32)
+    )
+    loader = DataLoader(
+        TensorDataset(train_t),
+        batch_size=256, shuffle=True,
+        pin_memory=device.type == "cuda"
     )
-    vae = VAE(len(FEATURES))
+    vae = VAE(len(FEATURES)).to(device)
     opt = optim.Adam(vae.parameters(), lr=0.001)
     for _ in range(100):
-        for (x,) in DataLoader(
-            TensorDataset(train_t),
-            batch_size=256, shuffle=True
-        ):
+        for (x,) in loader:
+            x = x.to(device, non_blocking=True)
             opt.zero_grad()
             r, mu, lv = vae(x)
-            loss = (nn.MSELoss()(r, x) +
-                    -0.001*0.5*torch.mean(
-                        1+lv-mu.pow(2)-lv.exp()
-                    ))
+            kl   = -0.5 * (
+                1 + lv - mu.pow(2) - lv.exp()
+            ).mean()
+            loss = F.mse_loss(r, x) + 0.001 * kl
             loss.backward()
             opt.step()
     vae.eval()
-    vae_list = []
+    x_test = df_scaled.loc[test_idx].to_numpy(
+        dtype=np.float32, copy=True
+    )
+    x_test[:, rr_col] = 0.0
     with torch.no_grad():
-        for idx in test_idx:
-            row = df_scaled.loc[idx].values.copy()
-            row[rr_col] = 0.0
-            r, _, _ = vae(
-                torch.FloatTensor(row).unsqueeze(0)
-            )
-            pred = (float(r[0, rr_col]) *
-                    rr_std + rr_mean)
-            vae_list.append(np.clip(pred, -8, 8))
-    vae_preds = np.array(vae_list)
+        r, _, _ = vae(torch.from_numpy(x_test).to(device))
+    vae_preds = np.clip(
+        r[:, rr_col].cpu().numpy() * rr_std + rr_mean,
+        -8, 8
+    )
     results["VAE"] = {
         "preds": vae_preds,
         "rmse": float(np.sqrt(mean_squared_error(
             true_arr, vae_preds))),
         "mae": float(mean_absolute_error(
             true_arr, vae_preds)),
-        "corr": float(np.corrcoef(
-            true_arr, vae_preds)[0, 1]),
+        "corr": _pearson(true_c, true_n, vae_preds),
         "time": time.time() - t0
     }
 
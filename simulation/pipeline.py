@@ -4,14 +4,16 @@ Master Simulation Pipeline
 Runs the complete simulation workflow end to end.
 
 Steps:
-  1. Load raw observations
-  2. Calculate range_km (physics)
-  3. Calculate range_rate_km_s (consecutive obs)
+  1. Load raw observations, deriving range_km
+     (physics) and range_rate_km_s (consecutive
+     obs) in the same query
+  2. Report range_km coverage
+  3. Report range_rate_km_s coverage
   4. Assign track_ids (grouping)
   5. Fill remaining range_rate gaps (mean)
-  6. Simulate sparse satellites
+  6. Save to observations_final and simulate
+     sparse satellites
   7. Validate results
-  8. Save to observations_final
 
 Usage:
   python pipeline.py
@@ -22,10 +24,10 @@ Runtime: ~5 seconds for 19,322 observations
 import duckdb
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import os
 import time
-from datetime import datetime, timedelta, timezone
-import uuid
+from datetime import datetime, timezone
 
 
 def find_database():
@@ -38,182 +40,227 @@ def find_database():
 
 def estimate_range(el, alt=500):
     R = 6371.0
-    el_rad = np.radians(el)
-    return (-R*np.sin(el_rad) +
-            np.sqrt((R*np.sin(el_rad))**2 +
+    r_sin = R*np.sin(np.radians(el))
+    return (-r_sin +
+            np.sqrt(r_sin*r_sin +
                     alt**2 + 2*R*alt))
 
 
-def calc_range_rate(ranges, times, max_rate=8.0):
-    rates = np.full(len(ranges), np.nan)
-    for i in range(1, len(ranges)):
-        dt = (times[i]-times[i-1]).total_seconds()
-        if 0 < dt <= 120:
-            dr = ranges[i] - ranges[i-1]
-            rate = dr / dt
-            if abs(rate) <= max_rate:
-                rates[i] = rate
-    return rates
-
-
 def assign_track_ids(df):
-    df = df.copy().sort_values(
+    # sort_values already returns a new frame
+    df = df.sort_values(
         "ob_time"
     ).reset_index(drop=True)
-    df["track_id"] = df["track_id"].astype(object)
-    counter = 1
-
-    for sat in df["sat_no"].unique():
-        sat_mask = df["sat_no"] == sat
-        for sensor in df[sat_mask]["sensor_name"].unique():
-            mask = sat_mask & (
-                df["sensor_name"] == sensor
-            )
-            obs = df[mask].sort_values("ob_time")
-            track = []
-            prev_t = None
-
-            for idx, row in obs.iterrows():
-                t = pd.to_datetime(row["ob_time"])
-                if prev_t is None:
-                    track = [idx]
-                else:
-                    gap = (t - prev_t).total_seconds()
-                    if gap <= 120:
-                        track.append(idx)
-                    else:
-                        tid = f"TRK{counter:06d}"
-                        for i in track:
-                            df.at[i, "track_id"] = tid
-                        counter += 1
-                        track = [idx]
-                prev_t = t
-
-            if track:
-                tid = f"TRK{counter:06d}"
-                for i in track:
-                    df.at[i, "track_id"] = tid
-                counter += 1
-
-    return df, counter - 1
+
+    # New track whenever sat/sensor changes or the
+    # gap to the previous obs exceeds 120 seconds.
+    # Obs with no sensor are left out of the grouping
+    srt = df[df["sensor_name"].notna()].sort_values(
+        ["sat_no", "sensor_name", "ob_time"]
+    )
+    grp_change = (
+        (srt["sat_no"] != srt["sat_no"].shift()) |
+        (srt["sensor_name"] !=
+         srt["sensor_name"].shift())
+    )
+    gap = srt["ob_time"].diff().dt.total_seconds()
+    track_num = (grp_change | (gap > 120)).cumsum()
+
+    n_tracks = int(track_num.max()) if len(srt) else 0
+
+    # Each id repeats for every obs in its track, so
+    # store codes + one label per track. Rows without
+    # a sensor keep the track_id they came in with
+    labels = pd.Index(
+        [f"TRK{i:06d}" for i in range(1, n_tracks + 1)]
+    )
+    kept = df["track_id"].to_numpy(dtype=object)
+    kept = kept[df["sensor_name"].isna().to_numpy()]
+    labels = labels.append(
+        pd.Index(pd.unique(kept[pd.notna(kept)]))
+        .difference(labels, sort=False)
+    )
+    codes = labels.get_indexer(df["track_id"])
+    codes[srt.index.to_numpy()] = track_num.to_numpy() - 1
+    df["track_id"] = pd.Categorical.from_codes(
+        codes, categories=labels
+    )
+
+    return df, n_tracks
+
+
+def batch_uuids(n):
+    """n random UUID4 strings from one os.urandom read."""
+    raw = np.frombuffer(
+        os.urandom(16 * n), dtype=np.uint8
+    ).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40   # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80   # RFC 4122
+    h = raw.tobytes().hex()
+    return [
+        f"{h[i:i+8]}-{h[i+8:i+12]}-{h[i+12:i+16]}-"
+        f"{h[i+16:i+20]}-{h[i+20:i+32]}"
+        for i in range(0, 32 * n, 32)
+    ]
 
 
 def simulate_sparse(con, threshold=100):
     """Generate observations for sparse satellites."""
-    sparse = con.execute(f"""
-        SELECT sat_no, COUNT(*) as n
-        FROM observations
-        WHERE is_simulated = false
-        GROUP BY sat_no
-        HAVING COUNT(*) < {threshold}
-    """).fetchdf()
-
-    all_sim = []
-
-    for _, row in sparse.iterrows():
-        sat = int(row["sat_no"])
-        obs = con.execute(f"""
-            SELECT * FROM observations
-            WHERE sat_no = {sat}
-            AND is_simulated = false
-            ORDER BY ob_time
-        """).fetchdf()
-
-        if len(obs) >= 2:
-            ra_rates, dec_rates, el_rates = [], [], []
-            for i in range(1, len(obs)):
-                t1 = pd.to_datetime(obs["ob_time"].iloc[i-1])
-                t2 = pd.to_datetime(obs["ob_time"].iloc[i])
-                dt = (t2-t1).total_seconds()
-                if 0 < dt <= 120:
-                    ra_rates.append(
-                        (obs["ra"].iloc[i]-obs["ra"].iloc[i-1])/dt)
-                    dec_rates.append(
-                        (obs["declination"].iloc[i]-obs["declination"].iloc[i-1])/dt)
-                    el_rates.append(
-                        (obs["elevation"].iloc[i]-obs["elevation"].iloc[i-1])/dt)
-
-            if ra_rates:
-                ra_r = np.median(ra_rates)
-                dec_r = np.median(dec_rates)
-                el_r = np.median(el_rates)
-            else:
-                ra_r, dec_r, el_r = 0.055, -0.020, -0.008
-        else:
-            ra_r, dec_r, el_r = 0.055, -0.020, -0.008
-
-        base_ra  = float(obs["ra"].iloc[-1])
-        base_dec = float(obs["declination"].iloc[-1])
-        base_el  = float(obs["elevation"].mean())
-        base_az  = float(obs["azimuth"].iloc[-1])
-        base_t   = pd.to_datetime(obs["ob_time"].max())
-        sensor   = obs["sensor_name"].iloc[-1]
-
-        for i in range(5):
-            start = base_t + timedelta(
-                seconds=(i+1)*90*60
-            )
-            for j in range(30):
-                dt = j * 10
-                new_el = base_el + el_r * dt
-                if new_el < 5 or new_el > 85:
-                    break
-                all_sim.append({
-                    "id": str(uuid.uuid4()),
-                    "sat_no": sat,
-                    "ob_time": start + timedelta(
-                        seconds=dt
-                    ),
-                    "ra": round(
-                        (base_ra+ra_r*dt)%360, 6
-                    ),
-                    "declination": round(
-                        base_dec+dec_r*dt, 6
-                    ),
-                    "range_km": round(
-                        estimate_range(new_el), 4
-                    ),
-                    "range_rate_km_s": None,
-                    "azimuth": round(
-                        (base_az+ra_r*dt*0.8)%360, 6
-                    ),
-                    "elevation": round(new_el, 6),
-                    "sensor_name": sensor,
-                    "data_mode": "SIMULATED",
-                    "track_id": f"TRK_SIM_{sat}_{i:03d}",
-                    "is_uct": False,
-                    "is_simulated": True,
-                    "created_at": datetime.now(timezone.utc)
-                })
-
-    if all_sim:
-        sim_df = pd.DataFrame(all_sim)
-        con.execute(
-            "DROP TABLE IF EXISTS observations_simulated"
+    # All sparse-sat rows in one scan, with the deltas
+    # to the previous obs of the same satellite
+    obs = con.execute("""
+        WITH sparse AS (
+            SELECT sat_no
+            FROM observations
+            WHERE is_simulated = false
+            GROUP BY sat_no
+            HAVING COUNT(*) < ?
         )
-        con.register("sim_df", sim_df)
-        con.execute("""
-            CREATE TABLE observations_simulated AS
-            SELECT * FROM sim_df
-        """)
-        return len(sim_df)
-    return 0
-
-
-def validate(df):
-    """Run physical validity checks."""
-    n = len(df)
-    checks = {
-        "RA (0-360)":       ((df.ra>=0)&(df.ra<=360)).sum(),
-        "Dec (-90 to +90)": ((df.declination>=-90)&
-                             (df.declination<=90)).sum(),
-        "Elevation (5-85)": ((df.elevation>=5)&
-                             (df.elevation<=85)).sum(),
-        "Range (400-2500)": ((df.range_km>=400)&
-                             (df.range_km<=2500)).sum(),
-    }
+        SELECT
+            o.sat_no, o.ob_time, o.ra, o.declination,
+            o.elevation, o.azimuth, o.sensor_name,
+            EXTRACT(EPOCH FROM o.ob_time -
+                    LAG(o.ob_time) OVER w) AS dt,
+            o.ra - LAG(o.ra) OVER w AS d_ra,
+            o.declination -
+                LAG(o.declination) OVER w AS d_dec,
+            o.elevation -
+                LAG(o.elevation) OVER w AS d_el
+        FROM observations o
+        JOIN sparse USING (sat_no)
+        WHERE o.is_simulated = false
+        WINDOW w AS (
+            PARTITION BY o.sat_no ORDER BY o.ob_time
+        )
+        ORDER BY o.sat_no, o.ob_time
+    """, [threshold]).fetchdf()
+
+    ok = (obs["dt"] > 0) & (obs["dt"] <= 120)
+    rates = pd.DataFrame({
+        "ra_r":  obs["d_ra"]  / obs["dt"],
+        "dec_r": obs["d_dec"] / obs["dt"],
+        "el_r":  obs["d_el"]  / obs["dt"],
+    })[ok].groupby(obs["sat_no"][ok]).median()
+
+    # Rows are ordered by time, so the last row per
+    # sat carries the latest ra/dec/az/sensor and time
+    base = obs.drop_duplicates(
+        "sat_no", keep="last"
+    ).set_index("sat_no")
+    base["mean_el"] = obs.groupby("sat_no")[
+        "elevation"
+    ].mean()
+
+    # Sats without a usable pair fall back to typical
+    # LEO rates
+    has_rates = base.index.isin(rates.index)
+    rates = rates.reindex(base.index)
+    ra_r  = np.where(has_rates, rates["ra_r"],   0.055)
+    dec_r = np.where(has_rates, rates["dec_r"], -0.020)
+    el_r  = np.where(has_rates, rates["el_r"],  -0.008)
+
+    # (sat, step) grids: 30 steps of 10 s. Geometry is
+    # the same for all 5 tracks of a sat, so each track
+    # stops at the first step outside the 5-85 deg
+    # window
+    dt     = np.arange(30) * 10
+    new_el = base["mean_el"].to_numpy()[:, None] + (
+        el_r[:, None] * dt
+    )
+    out    = (new_el < 5) | (new_el > 85)
+    keep   = ~np.logical_or.accumulate(out, axis=1)
+
+    grid  = (len(base), 5, len(dt))
+    mask  = np.broadcast_to(keep[:, None, :], grid)
+    n     = int(mask.sum())
+    if n == 0:
+        return 0
+
+    sat_i = np.broadcast_to(
+        np.arange(len(base))[:, None, None], grid
+    )[mask]
+    track = np.broadcast_to(
+        np.arange(5)[None, :, None], grid
+    )[mask]
+    step  = np.broadcast_to(dt, grid)[mask]
+
+    def per_track(values):
+        """Spread a (sat, step) grid over the 5 tracks."""
+        return np.broadcast_to(
+            values[:, None, :], grid
+        )[mask]
+
+    ra  = base["ra"].to_numpy()[:, None]
+    dec = base["declination"].to_numpy()[:, None]
+    az  = base["azimuth"].to_numpy()[:, None]
+    sats = base.index.to_numpy(np.int64)[sat_i]
+
+    sim = pa.table({
+        "id": batch_uuids(n),
+        "sat_no": sats,
+        "ob_time": pa.array(
+            pd.DatetimeIndex(
+                base["ob_time"].array.take(sat_i)
+            ) + pd.to_timedelta(
+                (track+1)*90*60 + step, unit="s"
+            )
+        ),
+        "ra": per_track(np.round(
+            (ra + ra_r[:, None]*dt) % 360, 6)),
+        "declination": per_track(np.round(
+            dec + dec_r[:, None]*dt, 6)),
+        "range_km": per_track(np.round(
+            estimate_range(new_el), 4)),
+        "range_rate_km_s": pa.nulls(n, pa.int32()),
+        "azimuth": per_track(np.round(
+            (az + ra_r[:, None]*dt*0.8) % 360, 6)),
+        "elevation": per_track(np.round(new_el, 6)),
+        # a sat's latest obs may have no sensor
+        "sensor_name": pa.array(
+            base["sensor_name"].to_numpy(object)[sat_i],
+            type=pa.string(), from_pandas=True
+        ),
+        "data_mode": pa.repeat(pa.scalar("SIMULATED"), n),
+        "track_id": [
+            f"TRK_SIM_{s}_{t:03d}"
+            for s, t in zip(sats, track)
+        ],
+        "is_uct": np.zeros(n, dtype=bool),
+        "is_simulated": np.ones(n, dtype=bool),
+        "created_at": pa.repeat(
+            pa.scalar(datetime.now(timezone.utc)), n
+        ),
+    })
+    con.execute(
+        "DROP TABLE IF EXISTS observations_simulated"
+    )
+    con.register("sim_arrow", sim)
+    con.execute("""
+        CREATE TABLE observations_simulated AS
+        SELECT * FROM sim_arrow
+    """)
+    return sim.num_rows
+
+
+def validate(con, table="observations_simulated"):
+    """Run physical validity checks in one scan."""
+    n, *counts = con.execute(f"""
+        SELECT
+            COUNT(*),
+            COUNT_IF(ra BETWEEN 0 AND 360),
+            COUNT_IF(declination BETWEEN -90 AND 90),
+            COUNT_IF(elevation BETWEEN 5 AND 85),
+            COUNT_IF(range_km BETWEEN 400 AND 2500)
+        FROM {table}
+    """).fetchone()
+    if n == 0:
+        print("  No simulated obs to validate")
+        return False
+
+    names = ["RA (0-360)", "Dec (-90 to +90)",
+             "Elevation (5-85)", "Range (400-2500)"]
     all_pass = True
-    for name, count in checks.items():
+    for name, count in zip(names, counts):
         status = "✅" if count == n else "❌"
         if count != n:
             all_pass = False
@@ -231,30 +278,58 @@ def run():
     print("=" * 55)
 
     print("\n[1/7] Loading observations...")
+    # sat_no fits in int32 while it drives the track
+    # grouping; it goes back to the stored type in
+    # [6/7]. range_km [2/7] and range_rate_km_s [3/7]
+    # are derived in the same query (LAG over each
+    # sat's time-ordered obs), so neither stored
+    # column is read. track_id is rebuilt in [4/7] except for
+    # obs with no sensor, which keep the stored one.
+    source = con.table("observations")
+    columns, types = source.columns, source.types
     df = con.execute("""
-        SELECT * FROM observations
+        WITH src AS (
+            SELECT * EXCLUDE (range_km, range_rate_km_s)
+            REPLACE (CAST(sat_no AS INTEGER) AS sat_no),
+            6371.0 * sin(radians(elevation)) AS r_sin
+            FROM observations
+        ),
+        ranged AS (
+            SELECT * EXCLUDE (r_sin),
+                   -r_sin + sqrt(
+                       r_sin * r_sin +
+                       500.0 * 500.0 + 2 * 6371.0 * 500.0
+                   ) AS range_km
+            FROM src
+        ),
+        deltas AS (
+            SELECT *,
+                   EXTRACT(EPOCH FROM ob_time -
+                           LAG(ob_time) OVER w) AS dt,
+                   range_km - LAG(range_km) OVER w AS dr
+            FROM ranged
+            WINDOW w AS (
+                PARTITION BY sat_no ORDER BY ob_time
+            )
+        )
+        SELECT * EXCLUDE (dt, dr),
+               CASE WHEN dt > 0 AND dt <= 120
+                     AND abs(dr / dt) <= 8.0
+                    THEN dr / dt
+               END AS range_rate_km_s
+        FROM deltas
         ORDER BY sat_no, ob_time
     """).fetchdf()
+    df["ob_time"] = pd.to_datetime(df["ob_time"])
+    # low-cardinality labels: compare/sort on codes
+    for col in ("sensor_name", "data_mode"):
+        df[col] = df[col].astype("category")
     print(f"      {len(df):,} rows")
 
     print("[2/7] Calculating range_km...")
-    df["range_km"] = df["elevation"].apply(
-        estimate_range
-    )
     print(f"      {df.range_km.notna().sum():,} filled")
 
     print("[3/7] Calculating range_rate_km_s...")
-    df["range_rate_km_s"] = np.nan
-    for sat in df["sat_no"].unique():
-        mask = df["sat_no"] == sat
-        sat_df = df[mask].copy()
-        times = pd.to_datetime(
-            sat_df["ob_time"]
-        ).tolist()
-        rates = calc_range_rate(
-            sat_df["range_km"].values, times
-        )
-        df.loc[mask, "range_rate_km_s"] = rates
     filled = df.range_rate_km_s.notna().sum()
     print(f"      {filled:,} filled "
           f"({filled/len(df)*100:.1f}%)")
@@ -275,22 +350,28 @@ def run():
 
     print("[6/7] Simulating sparse satellites...")
     con.execute("DROP TABLE IF EXISTS observations_final")
-    con.register("df_pipe", df)
-    con.execute("""
+    # via Arrow so the categorical track_id lands as
+    # VARCHAR rather than a DuckDB ENUM
+    con.register("df_pipe", pa.Table.from_pandas(
+        df, preserve_index=False
+    ))
+    # keep the source table's column order and
+    # sat_no type
+    select = ", ".join(
+        f'CAST("{c}" AS {t}) AS "{c}"' if c == "sat_no"
+        else f'"{c}"'
+        for c, t in zip(columns, types)
+    )
+    con.execute(f"""
         CREATE TABLE observations_final AS
-        SELECT * FROM df_pipe
+        SELECT {select}
+        FROM df_pipe
     """)
     n_sim = simulate_sparse(con)
     print(f"      {n_sim} new observations generated")
 
     print("[7/7] Validating...")
-    sim_df = con.execute("""
-        SELECT * FROM observations_simulated
-    """).fetchdf()
-    if len(sim_df) > 0:
-        validate(sim_df)
-    else:
-        print("  No simulated obs to validate")
+    validate(con)
 
     elapsed = time.time() - t0
     print(f"\n{'='*55}")
@@ -16,24 +16,41 @@ Generated observations are flagged:
 import duckdb
 import pandas as pd
 import numpy as np
-import uuid
 import os
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
 
 def estimate_range(elevation_deg, altitude_km=500):
     R = 6371.0
-    el_rad = np.radians(elevation_deg)
+    r_sin = R * np.sin(np.radians(elevation_deg))
     return (
-        -R * np.sin(el_rad) +
+        -r_sin +
         np.sqrt(
-            (R * np.sin(el_rad))**2 +
+            r_sin**2 +
             altitude_km**2 +
             2 * R * altitude_km
         )
     )
 
 
+def batch_uuids(n):
+    """
+    Generate n UUID4 strings from a single
+    os.urandom read instead of n uuid4() calls.
+    """
+    raw = np.frombuffer(
+        os.urandom(16 * n), dtype=np.uint8
+    ).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    h = raw.tobytes().hex()
+    return [
+        f"{h[i:i+8]}-{h[i+8:i+12]}-{h[i+12:i+16]}-"
+        f"{h[i+16:i+20]}-{h[i+20:i+32]}"
+        for i in range(0, 32 * n, 32)
+    ]
+
+
 def extract_motion_rates(obs_df):
     """
     Extract angular velocity from existing track.
@@ -41,43 +58,29 @@ def extract_motion_rates(obs_df):
     Returns:
         ra_rate, dec_rate, el_rate (deg/sec)
     """
-    obs_df = obs_df.sort_values(
-        "ob_time"
-    ).reset_index(drop=True)
-
-    ra_rates, dec_rates, el_rates = [], [], []
-
-    for i in range(1, len(obs_df)):
-        t1 = pd.to_datetime(obs_df["ob_time"].iloc[i-1])
-        t2 = pd.to_datetime(obs_df["ob_time"].iloc[i])
-        dt = (t2 - t1).total_seconds()
-        if 0 < dt <= 120:
-            ra_rates.append(
-                (obs_df["ra"].iloc[i] -
-                 obs_df["ra"].iloc[i-1]) / dt
-            )
-            dec_rates.append(
-                (obs_df["declination"].iloc[i] -
-                 obs_df["declination"].iloc[i-1]) / dt
-            )
-            el_rates.append(
-                (obs_df["elevation"].iloc[i] -
-                 obs_df["elevation"].iloc[i-1]) / dt
-            )
+    obs_df = obs_df.sort_values("ob_time")
 
-    if not ra_rates:
+    dt = np.diff(
+        pd.to_datetime(obs_df["ob_time"]).to_numpy()
+    ) / np.timedelta64(1, "s")
+    ok = (dt > 0) & (dt <= 120)
+
+    if not ok.any():
         return None, None, None
 
-    return (
-        np.median(ra_rates),
-        np.median(dec_rates),
-        np.median(el_rates)
+    dt = dt[ok]
+    return tuple(
+        np.median(
+            np.diff(obs_df[col].to_numpy(float))[ok] / dt
+        )
+        for col in ("ra", "declination", "elevation")
     )
 
 
 def simulate_tracks(sat_no, obs_df, n_tracks=5,
                     obs_per_track=30,
-                    step_seconds=10):
+                    step_seconds=10,
+                    created_at=None):
     """
     Generate synthetic observation tracks.
 
@@ -90,6 +93,8 @@ def simulate_tracks(sat_no, obs_df, n_tracks=5,
         n_tracks:      number of tracks to generate
         obs_per_track: max observations per track
         step_seconds:  time step between observations
+        created_at:    timestamp stamped on every row
+                       (defaults to now)
 
     Returns:
         DataFrame of simulated observations
@@ -117,59 +122,59 @@ def simulate_tracks(sat_no, obs_df, n_tracks=5,
     base_time = pd.to_datetime(obs_df["ob_time"].max())
     sensor    = obs_df["sensor_name"].iloc[-1]
 
-    all_tracks = []
-
-    for i in range(n_tracks):
-        track_start = base_time + timedelta(
-            seconds=(i + 1) * 90 * 60
-        )
-        rows = []
-
-        for j in range(obs_per_track):
-            dt_sec  = j * step_seconds
-            new_el  = base_el  + el_rate  * dt_sec
-
-            if new_el < 5 or new_el > 85:
-                break
-
-            new_ra  = (base_ra + ra_rate * dt_sec) % 360
-            new_dec = base_dec + dec_rate * dt_sec
-            new_az  = (base_az + ra_rate *
-                       dt_sec * 0.8) % 360
-
-            rows.append({
-                "id": str(uuid.uuid4()),
-                "sat_no": int(sat_no),
-                "ob_time": track_start + timedelta(
-                    seconds=dt_sec
-                ),
-                "ra": round(new_ra, 6),
-                "declination": round(new_dec, 6),
-                "range_km": round(
-                    estimate_range(new_el), 4
-                ),
-                "range_rate_km_s": None,
-                "azimuth": round(new_az, 6),
-                "elevation": round(new_el, 6),
-                "sensor_name": sensor,
-                "data_mode": "SIMULATED",
-                "track_id": (
-                    f"TRK_SIM_{sat_no}_{i:03d}"
-                ),
-                "is_uct": False,
-                "is_simulated": True,
-                "created_at": datetime.now(
-                    timezone.utc
-                )
-            })
-
-        if rows:
-            all_tracks.append(pd.DataFrame(rows))
-
-    return (
-        pd.concat(all_tracks, ignore_index=True)
-        if all_tracks else pd.DataFrame()
+    # The projected geometry is the same for every
+    # track; only the start time differs
+    dt_sec  = np.arange(obs_per_track) * step_seconds
+    new_el  = base_el + el_rate * dt_sec
+    out     = (new_el < 5) | (new_el > 85)
+    n_obs   = (int(np.argmax(out)) if out.any()
+               else obs_per_track)
+    dt_sec  = dt_sec[:n_obs]
+    new_el  = new_el[:n_obs]
+    new_ra  = (base_ra + ra_rate * dt_sec) % 360
+    new_dec = base_dec + dec_rate * dt_sec
+    new_az  = (base_az + ra_rate *
+               dt_sec * 0.8) % 360
+    ranges  = estimate_range(new_el)
+
+    # Lay all tracks out back to back: track k starts
+    # (k + 1) orbital periods after the last real obs
+    track = np.repeat(np.arange(n_tracks), n_obs)
+    offs  = (track + 1) * 90 * 60 + np.tile(
+        dt_sec, n_tracks
     )
+    n = len(track)
+    if n == 0:
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        "id": batch_uuids(n),
+        "sat_no": int(sat_no),
+        "ob_time": base_time + pd.to_timedelta(
+            offs, unit="s"
+        ),
+        "ra": np.tile(np.round(new_ra, 6), n_tracks),
+        "declination": np.tile(
+            np.round(new_dec, 6), n_tracks
+        ),
+        "range_km": np.tile(
+            np.round(ranges, 4), n_tracks
+        ),
+        "range_rate_km_s": [None] * n,
+        "azimuth": np.tile(np.round(new_az, 6), n_tracks),
+        "elevation": np.tile(
+            np.round(new_el, 6), n_tracks
+        ),
+        "sensor_name": sensor,
+        "data_mode": "SIMULATED",
+        "track_id": [
+            f"TRK_SIM_{sat_no}_{i:03d}" for i in track
+        ],
+        "is_uct": False,
+        "is_simulated": True,
+        "created_at": (created_at or
+                       datetime.now(timezone.utc))
+    })
 
 
 def run_sparse_simulation(con,
@@ -177,31 +182,38 @@ def run_sparse_simulation(con,
     """Run simulation for all sparse satellites."""
     print("Identifying sparse satellites...")
 
-    sparse_sats = con.execute(f"""
-        SELECT sat_no, COUNT(*) as n_obs
-        FROM observations
-        WHERE is_simulated = false
-        GROUP BY sat_no
-        HAVING COUNT(*) < {sparse_threshold}
-        ORDER BY n_obs
-    """).fetchdf()
+    # Every sparse-sat row in one query instead of one
+    # round-trip per satellite
+    sparse_obs = con.execute("""
+        SELECT *
+        FROM (
+            SELECT *,
+                   COUNT(*) OVER (
+                       PARTITION BY sat_no
+                   ) AS n_obs
+            FROM observations
+            WHERE is_simulated = false
+        )
+        WHERE n_obs < ?
+        ORDER BY n_obs, sat_no, ob_time
+    """, [sparse_threshold]).fetchdf()
 
-    print(f"  Found {len(sparse_sats)} sparse sats")
+    groups = sparse_obs.groupby("sat_no", sort=False)
+    print(f"  Found {groups.ngroups} sparse sats")
 
     all_sim = []
+    now = datetime.now(timezone.utc)
 
-    for _, row in sparse_sats.iterrows():
-        sat_no = int(row["sat_no"])
-        n_real = int(row["n_obs"])
+    for sat_no, obs in groups:
+        sat_no = int(sat_no)
+        n_real = len(obs)
+        obs = obs.drop(
+            columns="n_obs"
+        ).reset_index(drop=True)
 
-        obs = con.execute(f"""
-            SELECT * FROM observations
-            WHERE sat_no = {sat_no}
-            AND is_simulated = false
-            ORDER BY ob_time
-        """).fetchdf()
-
-        sim_df = simulate_tracks(sat_no, obs)
+        sim_df = simulate_tracks(
+            sat_no, obs, created_at=now
+        )
 
         if len(sim_df) > 0:
             all_sim.append(sim_df)
@@ -24,6 +24,8 @@ import os
 import json
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -51,6 +53,7 @@ config = {
     'quality_tier': 'T3',
     'search_strategy': 'auto',
     'max_datapoints': 1000,
+    'max_concurrent_windows': 8,
     'enable_simulation': True,
     'enable_downsampling': True
 }
@@ -94,34 +97,25 @@ print("="*80)
 tle_df = pd.read_csv('data/referenceTLEs_.csv')
 tle_df_filtered = tle_df[tle_df['satNo'].isin(config['satellite_ids'])]
 
-def detect_regime(tle_row):
-    mean_motion = float(tle_row['meanMotion'])
-    n = mean_motion * (2 * np.pi) / 86400
-    mu = 398600.4418
-    a = (mu / (n**2)) ** (1/3)
-    
-    try:
-        ecc = float(tle_row['eccentricity'])
-    except:
-        ecc = 0.0
-    
-    if ecc >= 0.7:
-        return 'HEO', a
-    elif a < 8378:
-        return 'LEO', a
-    elif a >= 42164:
-        return 'GEO', a
-    else:
-        return 'MEO', a
+# Semi-major axis and regime for every TLE row at once
+mu = 398600.4418
+n = tle_df_filtered['meanMotion'].to_numpy(dtype=float) * (2 * np.pi) / 86400
+sma = (mu / (n**2)) ** (1/3)
+ecc = pd.to_numeric(tle_df_filtered['eccentricity'], errors='coerce').fillna(0.0).to_numpy()
+tle_df_filtered = tle_df_filtered.assign(
+    regime=np.select([ecc >= 0.7, sma < 8378, sma >= 42164], ['HEO', 'LEO', 'GEO'], default='MEO'),
+    sma=sma
+)
 
+# Regime of each satellite comes from its first TLE row
+first_tle = tle_df_filtered.drop_duplicates('satNo').set_index('satNo')
 regimes = {}
 for sat in config['satellite_ids']:
-    sat_tle = tle_df_filtered[tle_df_filtered['satNo'] == sat]
-    if len(sat_tle) > 0:
-        regime, sma = detect_regime(sat_tle.iloc[0])
-        regimes[sat] = regime
-        period_hours = 24 / sat_tle.iloc[0]['meanMotion']
-        print(f"✅ Satellite {sat}: {regime} (SMA: {sma:,.0f} km, Period: {period_hours:.1f}h)")
+    if sat in first_tle.index:
+        tle = first_tle.loc[sat]
+        regimes[sat] = tle['regime']
+        period_hours = 24 / tle['meanMotion']
+        print(f"✅ Satellite {sat}: {tle['regime']} (SMA: {tle['sma']:,.0f} km, Period: {period_hours:.1f}h)")
 
 primary_regime = list(regimes.values())[0] if regimes else 'GEO'
 
@@ -156,41 +150,51 @@ print("="*80)
 
 from uct_benchmark.api.apiIntegration import asyncUDLBatchQuery, datetimeToUDL
 
+# One request per time range for all satellites (UDL takes a comma-separated satNo)
+sat_list = ','.join(map(str, config['satellite_ids']))
+
 if selected_strategy == 'WINDOWED':
     window_hours = 24 if primary_regime == 'GEO' else 12
-    windows = []
-    current = config['start_time']
-    while current < config['end_time']:
-        window_end = min(current + timedelta(hours=window_hours), config['end_time'])
-        windows.append((current, window_end))
-        current = window_end
+    # Window edges in one call; the last window is clipped to end_time
+    edges = list(pd.date_range(config['start_time'], config['end_time'], freq=f'{window_hours}h').to_pydatetime())
+    if not edges or edges[-1] != config['end_time']:
+        edges.append(config['end_time'])
+    windows = list(zip(edges[:-1], edges[1:]))
     
     print(f"📡 Executing WINDOWED strategy ({len(windows)} windows)...")
-    all_sv_data = []
-    for i, (win_start, win_end) in enumerate(windows, 1):
-        sv_params = []
-        for sat in config['satellite_ids']:
-            sv_params.append({
-                'satNo': str(sat),
-                'epoch': f"{datetimeToUDL(win_start)}..{datetimeToUDL(win_end)}"
-            })
+    
+    def query_window(window):
+        win_start, win_end = window
+        sv_params = [{
+            'satNo': sat_list,
+            'epoch': f"{datetimeToUDL(win_start)}..{datetimeToUDL(win_end)}"
+        }]
         try:
-            window_data = asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
-            all_sv_data.append(window_data)
-            if i % 10 == 0:
-                print(f"   Window {i}/{len(windows)}: {len(window_data)} records")
+            return asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
         except:
+            return None
+    
+    # Windows are independent, so overlap their round-trips
+    with ThreadPoolExecutor(max_workers=config['max_concurrent_windows']) as executor:
+        results = list(executor.map(query_window, windows))
+    
+    all_sv_data = []
+    for i, window_data in enumerate(results, 1):
+        if window_data is None:
             continue
+        all_sv_data.append(window_data)
+        if i % 10 == 0:
+            print(f"   Window {i}/{len(windows)}: {len(window_data)} records")
     
-    sv_df = pd.concat(all_sv_data, ignore_index=True) if all_sv_data else pd.DataFrame()
+    # Stack windows via Arrow: one copy into the final frame instead of pd.concat's
+    tables = [pa.Table.from_pandas(w, preserve_index=False) for w in all_sv_data if len(w) > 0]
+    sv_df = pa.concat_tables(tables, promote_options='permissive').to_pandas(self_destruct=True) if tables else pd.DataFrame()
 else:
     # FAST or HYBRID
-    sv_params = []
-    for sat in config['satellite_ids']:
-        sv_params.append({
-            'satNo': str(sat),
-            'epoch': f"{datetimeToUDL(config['start_time'])}..{datetimeToUDL(config['end_time'])}"
-        })
+    sv_params = [{
+        'satNo': sat_list,
+        'epoch': f"{datetimeToUDL(config['start_time'])}..{datetimeToUDL(config['end_time'])}"
+    }]
     sv_df = asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
 
 print(f"✅ Retrieved {len(sv_df)} state vectors")
@@ -204,7 +208,9 @@ print("SECTION 6: DEDUPLICATION & VALIDATION")
 print("="*80)
 
 original_count = len(sv_df)
-sv_df['epoch'] = pd.to_datetime(sv_df['epoch'])
+# UDL epochs are ISO 8601 but do not always carry fractional seconds, which
+# a format inferred from the first row would reject
+sv_df['epoch'] = pd.to_datetime(sv_df['epoch'], format='ISO8601')
 sv_df = sv_df.drop_duplicates(subset=['satNo', 'epoch'], keep='first')
 
 print(f"✅ Removed {original_count - len(sv_df)} duplicates")
@@ -218,29 +224,17 @@ print("\n" + "="*80)
 print("SECTION 7: TRACK BINNING (Sparse Data Mode)")
 print("="*80)
 
-sv_df = sv_df.sort_values(['satNo', 'epoch']).reset_index(drop=True)
-sv_df['trackId'] = None
-current_track_id = 1
+sv_df = sv_df.sort_values(['satNo', 'epoch'], kind='stable', ignore_index=True)
 
-for sat in sv_df['satNo'].unique():
-    sat_mask = sv_df['satNo'] == sat
-    sat_indices = sv_df[sat_mask].index
-    sv_df.loc[sat_indices[0], 'trackId'] = current_track_id
-    current_sat_track = current_track_id
-    
-    for i in range(1, len(sat_indices)):
-        prev_idx = sat_indices[i-1]
-        curr_idx = sat_indices[i]
-        time_gap = (sv_df.loc[curr_idx, 'epoch'] - sv_df.loc[prev_idx, 'epoch']).total_seconds() / 3600
-        
-        if time_gap > 6.0:
-            current_track_id += 1
-            current_sat_track = current_track_id
-        
-        sv_df.loc[curr_idx, 'trackId'] = current_sat_track
-    current_track_id += 1
-
-sv_df['trackId'] = sv_df['trackId'].astype(int)
+# New track at each satellite's first obs or after a gap > 6 hours; gaps come
+# straight from the int64 nanosecond epochs of the sorted frame
+epoch_ns = sv_df['epoch'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+sat_nos = sv_df['satNo'].to_numpy()
+gap_hours = np.full(len(sv_df), np.nan)
+gap_hours[1:] = (epoch_ns[1:] - epoch_ns[:-1]) / 3.6e12
+gap_hours[1:][sat_nos[1:] != sat_nos[:-1]] = np.nan
+new_track = np.isnan(gap_hours) | (gap_hours > 6.0)
+sv_df['trackId'] = np.cumsum(new_track, dtype=np.int32)
 
 print(f"✅ Created {sv_df['trackId'].nunique()} tracks (no filtering for sparse data)")
 
@@ -272,22 +266,23 @@ print("SECTION 9: DOWNSAMPLING")
 print("="*80)
 
 max_obs = tier_config['max_obs_per_sat']
-downsampled_data = []
 
-for sat in sorted(sv_df['satNo'].unique()):
-    sat_data = sv_df[sv_df['satNo'] == sat].copy().sort_values('epoch').reset_index(drop=True)
-    current_count = len(sat_data)
-    
+# sv_df is sorted by (satNo, epoch) since Section 7, so each satellite is a
+# contiguous block: pick row positions per block and take them all at once
+counts = sv_df.groupby('satNo').size()
+starts = counts.cumsum() - counts
+keep_positions = []
+
+for sat, current_count in counts.items():
     if current_count > max_obs:
-        indices_to_keep = np.linspace(0, len(sat_data) - 1, max_obs, dtype=int)
-        sat_downsampled = sat_data.iloc[np.unique(indices_to_keep)].copy()
-        print(f"✅ Satellite {sat}: {current_count} → {len(sat_downsampled)} obs")
-        downsampled_data.append(sat_downsampled)
+        indices_to_keep = np.unique(np.linspace(0, current_count - 1, max_obs, dtype=int))
+        print(f"✅ Satellite {sat}: {current_count} → {len(indices_to_keep)} obs")
     else:
+        indices_to_keep = np.arange(current_count)
         print(f"✅ Satellite {sat}: {current_count} obs (within limit)")
-        downsampled_data.append(sat_data)
+    keep_positions.append(starts[sat] + indices_to_keep)
 
-downsampled_df = pd.concat(downsampled_data, ignore_index=True)
+downsampled_df = sv_df.iloc[np.concatenate(keep_positions)].reset_index(drop=True)
 print(f"   Total: {len(sv_df)} → {len(downsampled_df)} observations")
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -342,10 +337,11 @@ if proceed_to_simulation:
     print(f"   Output: {metadata['total_count']} total observations")
     print(f"   Synthetic ratio: {metadata['synthetic_ratio']:.1%}")
     
-    for sat in sorted(result_df['satNo'].unique()):
-        sat_real = result_df[(result_df['satNo'] == sat) & (result_df['is_simulated'] == False)]
-        sat_sim = result_df[(result_df['satNo'] == sat) & (result_df['is_simulated'] == True)]
-        print(f"   Satellite {sat}: {len(sat_real)} real + {len(sat_sim)} simulated = {len(sat_real) + len(sat_sim)} total")
+    sim_counts = (result_df.groupby(['satNo', 'is_simulated']).size()
+                  .unstack(fill_value=0)
+                  .reindex(columns=[False, True], fill_value=0))
+    for sat, n_real, n_sim in zip(sim_counts.index, sim_counts[False], sim_counts[True]):
+        print(f"   Satellite {sat}: {n_real} real + {n_sim} simulated = {n_real + n_sim} total")
 else:
     result_df = downsampled_df
     metadata = {'simulated_count': 0}
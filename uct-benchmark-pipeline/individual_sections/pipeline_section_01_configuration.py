@@ -4,6 +4,8 @@ Defines input parameters for the UCT Benchmark pipeline
 """
 from datetime import datetime, timedelta
 
+import pipeline_state
+
 print("="*80)
 print("SECTION 1: PIPELINE CONFIGURATION")
 print("="*80)
@@ -23,47 +25,58 @@ config = {
     # API Settings
     'search_strategy': 'auto',  # auto, fast, windowed, hybrid
     'max_datapoints': 1000,
+    'max_concurrent_windows': 8,  # WINDOWED strategy: windows queried at once
     
     # Processing Options
     'enable_simulation': True,
-    'enable_downsampling': True
+    'enable_downsampling': True,
+    'export_csv': False,  # Also write Section 5-9 data frames as CSV
+    'verbose': False  # Per-satellite detail in the Section 6 TLE check
 }
 
-print(f"\n📊 Configuration Summary:")
-print(f"   Satellites: {config['satellite_ids']}")
-print(f"   Number of satellites: {len(config['satellite_ids'])}")
-print(f"   ")
-print(f"   Time Range:")
-print(f"      Start: {config['start_time'].strftime('%Y-%m-%d %H:%M:%S')}")
-print(f"      End: {config['end_time'].strftime('%Y-%m-%d %H:%M:%S')}")
-print(f"      Duration: {(config['end_time'] - config['start_time']).days} days")
-print(f"   ")
-print(f"   Quality Settings:")
-print(f"      Tier: {config['quality_tier']}")
-print(f"      Search Strategy: {config['search_strategy']}")
-print(f"      Max Datapoints: {config['max_datapoints']}")
-print(f"   ")
-print(f"   Processing Options:")
-print(f"      Enable Simulation: {config['enable_simulation']}")
-print(f"      Enable Downsampling: {config['enable_downsampling']}")
+# Build the summary and print it in one call
+report = []
+report.append(f"\n📊 Configuration Summary:")
+report.append(f"   Satellites: {config['satellite_ids']}")
+report.append(f"   Number of satellites: {len(config['satellite_ids'])}")
+report.append(f"   ")
+report.append(f"   Time Range:")
+report.append(f"      Start: {config['start_time'].strftime('%Y-%m-%d %H:%M:%S')}")
+report.append(f"      End: {config['end_time'].strftime('%Y-%m-%d %H:%M:%S')}")
+report.append(f"      Duration: {(config['end_time'] - config['start_time']).days} days")
+report.append(f"   ")
+report.append(f"   Quality Settings:")
+report.append(f"      Tier: {config['quality_tier']}")
+report.append(f"      Search Strategy: {config['search_strategy']}")
+report.append(f"      Max Datapoints: {config['max_datapoints']}")
+report.append(f"      Max Concurrent Windows: {config['max_concurrent_windows']}")
+report.append(f"   ")
+report.append(f"   Processing Options:")
+report.append(f"      Enable Simulation: {config['enable_simulation']}")
+report.append(f"      Enable Downsampling: {config['enable_downsampling']}")
+report.append(f"      Export CSV: {config['export_csv']}")
+report.append(f"      Verbose: {config['verbose']}")
+print("\n".join(report))
 
 print(f"\n✅ Configuration Complete!")
 print(f"   Ready to proceed to Section 2 (UDL Authentication)")
 
 # Return config for next section
 print(f"\n📦 Exporting configuration...")
-import json
-with open('pipeline_config.json', 'w') as f:
-    json.dump({
-        'satellite_ids': config['satellite_ids'],
-        'start_time': config['start_time'].isoformat(),
-        'end_time': config['end_time'].isoformat(),
-        'quality_tier': config['quality_tier'],
-        'search_strategy': config['search_strategy'],
-        'max_datapoints': config['max_datapoints'],
-        'enable_simulation': config['enable_simulation'],
-        'enable_downsampling': config['enable_downsampling']
-    }, f, indent=2)
+# Later sections (e.g. Section 8) read this file directly, so always write it
+pipeline_state.save('pipeline_config.json', {
+    'satellite_ids': config['satellite_ids'],
+    'start_time': config['start_time'].isoformat(),
+    'end_time': config['end_time'].isoformat(),
+    'quality_tier': config['quality_tier'],
+    'search_strategy': config['search_strategy'],
+    'max_datapoints': config['max_datapoints'],
+    'max_concurrent_windows': config['max_concurrent_windows'],
+    'enable_simulation': config['enable_simulation'],
+    'enable_downsampling': config['enable_downsampling'],
+    'export_csv': config['export_csv'],
+    'verbose': config['verbose']
+}, checkpoint=True)
 
 print(f"   ✅ Configuration saved to pipeline_config.json")
 print("="*80)
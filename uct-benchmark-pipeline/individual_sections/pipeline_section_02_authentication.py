@@ -2,9 +2,10 @@
 SECTION 2: UDL AUTHENTICATION
 Establishes authentication with the UDL API
 """
-import json
 import os
-from dotenv import load_dotenv
+
+import pipeline_state
+import udl_auth
 
 print("="*80)
 print("SECTION 2: UDL AUTHENTICATION")
@@ -12,12 +13,11 @@ print("="*80)
 
 # Load configuration from Section 1
 print("\n📥 Loading configuration from Section 1...")
-with open('pipeline_config.json', 'r') as f:
-    config = json.load(f)
+config = pipeline_state.load('pipeline_config.json')
 print(f"   ✅ Configuration loaded")
 
 # Load environment variables
-load_dotenv()
+udl_auth.ensure_dotenv()
 
 print("\n🔑 Checking UDL credentials...")
 
@@ -25,12 +25,22 @@ print("\n🔑 Checking UDL credentials...")
 token = os.getenv('UDL_TOKEN')
 username = os.getenv('UDL_USERNAME')
 password = os.getenv('UDL_PASSWORD')
+cached_token = udl_auth.load_cached_token(username) if username and not token else None
 
 if token:
     print(f"   ✅ Existing UDL_TOKEN found")
     print(f"   Token preview: {token[:20]}...")
     token_source = "existing"
     
+elif username and password and cached_token:
+    # A token generated by an earlier run is still valid; skip the auth round-trip
+    token = cached_token
+    print(f"   ✅ UDL_USERNAME and UDL_PASSWORD found")
+    print(f"   Username: {username}")
+    print(f"   ✅ Reusing cached token from {udl_auth.TOKEN_CACHE}")
+    print(f"   Token preview: {token[:20]}...")
+    token_source = "cached"
+    
 elif username and password:
     print(f"   ✅ UDL_USERNAME and UDL_PASSWORD found")
     print(f"   Username: {username}")
@@ -43,6 +53,7 @@ elif username and password:
         print(f"   ✅ Token generated successfully!")
         print(f"   Token preview: {token[:20]}...")
         token_source = "generated"
+        udl_auth.save_cached_token(username, token)
         
         # Optionally save to .env
         print(f"\n💡 Tip: Add this to your .env file to avoid regenerating:")
@@ -63,15 +74,15 @@ else:
 
 # Test the token with a simple query
 print(f"\n🧪 Testing authentication...")
-from uct_benchmark.api.apiIntegration import UDLQuery
-
 try:
-    # Simple test query - get count of ISS state vectors from last day
-    test_result = UDLQuery(
+    from udl_client import udl_probe_count
+    
+    # Simple test query - count of ISS state vectors from last day, read from
+    # a one-record probe; a rejected token raises here
+    test_result = udl_probe_count(
         token, 
         'statevector', 
-        {'satNo': '25544', 'epoch': '>now-1 days'},
-        count=True
+        {'satNo': '25544', 'epoch': '>now-1 days'}
     )
     
     print(f"   ✅ Authentication successful!")
@@ -87,15 +98,16 @@ except Exception as e:
 # Save authentication data for next section
 print(f"\n📦 Saving authentication data...")
 
+# The token itself stays in the environment / token cache; later sections
+# fetch it with udl_auth.get_token()
 auth_data = {
-    'token': token,
+    'token_fingerprint': udl_auth.token_fingerprint(token),
     'token_source': token_source,
     'auth_status': auth_status,
     'test_query_count': test_result if auth_status == "valid" else 0
 }
 
-with open('pipeline_auth.json', 'w') as f:
-    json.dump(auth_data, f, indent=2)
+pipeline_state.save('pipeline_auth.json', auth_data)
 
 print(f"   ✅ Authentication data saved to pipeline_auth.json")
 
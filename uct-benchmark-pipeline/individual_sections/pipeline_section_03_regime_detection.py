@@ -2,22 +2,24 @@
 SECTION 3: ORBITAL REGIME DETECTION
 Classifies satellites into orbital regimes (LEO/MEO/GEO/HEO)
 """
-import json
+from collections import Counter
+
 import pandas as pd
 
+import pipeline_state
+import udl_auth
+import regime
+
 print("="*80)
 print("SECTION 3: ORBITAL REGIME DETECTION")
 print("="*80)
 
 # Load configuration and authentication
 print("\n📥 Loading previous sections...")
-with open('pipeline_config.json', 'r') as f:
-    config = json.load(f)
-    
-with open('pipeline_auth.json', 'r') as f:
-    auth = json.load(f)
+config = pipeline_state.load('pipeline_config.json')
+auth = pipeline_state.load('pipeline_auth.json')
 
-token = auth['token']
+token = udl_auth.get_token()
 satellite_ids = config['satellite_ids']
 
 print(f"   ✅ Configuration loaded: {len(satellite_ids)} satellites")
@@ -46,73 +48,48 @@ tle_df_filtered = tle_df[tle_df['satNo'].isin(satellite_ids)]
 print(f"   📊 TLE data available for {len(tle_df_filtered)} of {len(satellite_ids)} satellites")
 
 # Detect orbital regime for each satellite
-print(f"\n🛰️ Classifying Orbital Regimes:")
-print(f"   Rules:")
-print(f"      HEO: eccentricity ≥ 0.7")
-print(f"      LEO: SMA < 8,378 km")
-print(f"      GEO: SMA ≥ 42,164 km")
-print(f"      MEO: everything else")
-print()
-
-from uct_benchmark.api.apiIntegration import determine_orbital_regime
-
-regimes = {}
+# Collect the per-satellite report and print it in one call
+report = []
+report.append(f"\n🛰️ Classifying Orbital Regimes:")
+report.append(f"   Rules:")
+report.append(f"      HEO: eccentricity ≥ 0.7")
+report.append(f"      LEO: SMA < 8,378 km")
+report.append(f"      GEO: SMA ≥ 42,164 km")
+report.append(f"      MEO: everything else")
+report.append("")
+
+regimes, regime_details = regime.classify(tle_df_filtered, satellite_ids)
 
 for sat in satellite_ids:
-    sat_tle = tle_df_filtered[tle_df_filtered['satNo'] == sat]
+    details = regime_details[sat]
+    report.append(f"   Satellite {sat}:")
     
-    if len(sat_tle) > 0:
-        try:
-            # Get TLE data
-            tle_row = sat_tle.iloc[0]
-            
-            # Determine regime
-            regime = determine_orbital_regime(tle_row)
-            regimes[sat] = regime
-            
-            # Calculate orbital period
-            mean_motion = tle_row['meanMotion']  # revolutions per day
-            period_minutes = (24 * 60) / mean_motion
-            period_hours = period_minutes / 60
-            
-            # Get eccentricity if available
-            eccentricity = tle_row.get('eccentricity', 0.0)
-            
-            print(f"   Satellite {sat}:")
-            print(f"      Regime: {regime}")
-            print(f"      Orbital Period: {period_hours:.2f} hours ({period_minutes:.1f} min)")
-            print(f"      Mean Motion: {mean_motion:.2f} rev/day")
-            if eccentricity > 0:
-                print(f"      Eccentricity: {eccentricity:.6f}")
-            
-        except Exception as e:
-            print(f"   Satellite {sat}:")
-            print(f"      ⚠️ Could not determine regime: {e}")
-            regimes[sat] = 'UNKNOWN'
+    if details['regime'] == 'NO_TLE':
+        report.append(f"      ❌ No TLE data available")
+    elif details['regime'] == 'UNKNOWN':
+        report.append(f"      ⚠️ Could not determine regime: invalid mean motion")
     else:
-        print(f"   Satellite {sat}:")
-        print(f"      ❌ No TLE data available")
-        regimes[sat] = 'NO_TLE'
+        mean_motion = details['mean_motion']  # revolutions per day
+        period_minutes = (24 * 60) / mean_motion
+        
+        report.append(f"      Regime: {details['regime']}")
+        report.append(f"      Orbital Period: {details['period_hours']:.2f} hours ({period_minutes:.1f} min)")
+        report.append(f"      Mean Motion: {mean_motion:.2f} rev/day")
+        if details['eccentricity'] > 0:
+            report.append(f"      Eccentricity: {details['eccentricity']:.6f}")
+
+print("\n".join(report))
 
 # Summary statistics
 print(f"\n📊 Regime Distribution:")
-regime_counts = {}
-for regime in regimes.values():
-    regime_counts[regime] = regime_counts.get(regime, 0) + 1
+regime_counts = Counter(regimes.values())
 
-for regime, count in sorted(regime_counts.items()):
-    print(f"   {regime}: {count} satellite(s)")
+for regime_name, count in sorted(regime_counts.items()):
+    print(f"   {regime_name}: {count} satellite(s)")
 
 # Determine primary regime for pipeline decisions
-if regimes:
-    # Get most common regime (excluding NO_TLE and UNKNOWN)
-    valid_regimes = [r for r in regimes.values() if r not in ['NO_TLE', 'UNKNOWN']]
-    if valid_regimes:
-        primary_regime = max(set(valid_regimes), key=valid_regimes.count)
-    else:
-        primary_regime = 'GEO'  # Default assumption
-else:
-    primary_regime = 'GEO'
+# (most common regime excluding NO_TLE and UNKNOWN, GEO if there is none)
+primary_regime = regime.primary_regime(regime_counts)
 
 print(f"\n🎯 Primary Regime for Pipeline: {primary_regime}")
 print(f"   (Most common regime among satellites with TLE data)")
@@ -123,13 +100,12 @@ print(f"\n📦 Saving regime detection data...")
 regime_data = {
     'regimes': regimes,
     'primary_regime': primary_regime,
-    'regime_counts': regime_counts,
+    'regime_counts': dict(regime_counts),
     'satellites_with_tle': len([r for r in regimes.values() if r not in ['NO_TLE', 'UNKNOWN']]),
     'satellites_without_tle': len([r for r in regimes.values() if r in ['NO_TLE', 'UNKNOWN']])
 }
 
-with open('pipeline_regimes.json', 'w') as f:
-    json.dump(regime_data, f, indent=2)
+pipeline_state.save('pipeline_regimes.json', regime_data)
 
 print(f"   ✅ Regime data saved to pipeline_regimes.json")
 
@@ -2,20 +2,19 @@
 SECTION 4: SEARCH STRATEGY SELECTION
 Selects optimal API query strategy (FAST/WINDOWED/HYBRID)
 """
-import json
+from collections import namedtuple
 from datetime import datetime
 
+import pipeline_state
+
 print("="*80)
 print("SECTION 4: SEARCH STRATEGY SELECTION")
 print("="*80)
 
 # Load configuration and regime data
 print("\n📥 Loading previous sections...")
-with open('pipeline_config.json', 'r') as f:
-    config = json.load(f)
-    
-with open('pipeline_regimes.json', 'r') as f:
-    regime_data = json.load(f)
+config = pipeline_state.load('pipeline_config.json')
+regime_data = pipeline_state.load('pipeline_regimes.json')
 
 # Parse time range
 start_time = datetime.fromisoformat(config['start_time'])
@@ -39,55 +38,43 @@ print(f"   User Preference: {user_strategy}")
 # Define strategy selection logic
 print(f"\n🤔 Evaluating Strategy Options...")
 
-strategies_evaluated = {
-    'FAST': {
-        'suitable': False,
-        'reason': '',
-        'score': 0
-    },
-    'WINDOWED': {
-        'suitable': False,
-        'reason': '',
-        'score': 0
-    },
-    'HYBRID': {
-        'suitable': True,  # Always suitable as fallback
-        'reason': 'Count-first optimization (default)',
-        'score': 50
+# What a rule reports: the printed icon and label, and the saved reason
+# (formatted with sats and days)
+Verdict = namedtuple('Verdict', ['icon', 'label', 'reason'])
+
+# Strategy rules, evaluated in order:
+# (name, applies(num_sats, days), score, verdict if suitable, verdict if not)
+STRATEGY_RULES = [
+    ('FAST', lambda sats, days: sats <= 5 and days <= 7, 90,
+     Verdict('✅', 'Suitable', 'Small window ({days} days) + few satellites ({sats})'),
+     Verdict('❌', 'Not suitable', 'Too many satellites ({sats}) or long window ({days} days)')),
+    ('WINDOWED', lambda sats, days: sats >= 10 or days >= 30, 85,
+     Verdict('✅', 'Suitable', 'Large window ({days} days) or many satellites ({sats})'),
+     Verdict('⚠️', 'Possible but not optimal', 'Small scale ({sats} sats, {days} days)')),
+    ('HYBRID', lambda sats, days: True, 50,  # Always suitable as fallback
+     Verdict('✅', 'Always suitable', 'Count-first optimization (default)'),
+     None),  # never unsuitable
+]
+
+strategies_evaluated = {}
+for name, applies, score, if_suitable, if_not in STRATEGY_RULES:
+    suitable = applies(num_satellites, time_span_days)
+    verdict = if_suitable if suitable else if_not
+    reason = verdict.reason.format(sats=num_satellites, days=time_span_days)
+    strategies_evaluated[name] = {
+        'suitable': suitable,
+        'reason': reason,
+        'score': score if suitable else 0
     }
-}
-
-# FAST Strategy evaluation
-if num_satellites <= 5 and time_span_days <= 7:
-    strategies_evaluated['FAST']['suitable'] = True
-    strategies_evaluated['FAST']['reason'] = f'Small window ({time_span_days} days) + few satellites ({num_satellites})'
-    strategies_evaluated['FAST']['score'] = 90
-    print(f"   ✅ FAST: Suitable - {strategies_evaluated['FAST']['reason']}")
-else:
-    strategies_evaluated['FAST']['reason'] = f'Too many satellites ({num_satellites}) or long window ({time_span_days} days)'
-    print(f"   ❌ FAST: Not suitable - {strategies_evaluated['FAST']['reason']}")
-
-# WINDOWED Strategy evaluation
-if num_satellites >= 10 or time_span_days >= 30:
-    strategies_evaluated['WINDOWED']['suitable'] = True
-    strategies_evaluated['WINDOWED']['reason'] = f'Large window ({time_span_days} days) or many satellites ({num_satellites})'
-    strategies_evaluated['WINDOWED']['score'] = 85
-    print(f"   ✅ WINDOWED: Suitable - {strategies_evaluated['WINDOWED']['reason']}")
-else:
-    strategies_evaluated['WINDOWED']['reason'] = f'Small scale ({num_satellites} sats, {time_span_days} days)'
-    print(f"   ⚠️ WINDOWED: Possible but not optimal - {strategies_evaluated['WINDOWED']['reason']}")
-
-# HYBRID is always suitable
-print(f"   ✅ HYBRID: Always suitable - {strategies_evaluated['HYBRID']['reason']}")
+    print(f"   {verdict.icon} {name}: {verdict.label} - {reason}")
 
 # Select strategy based on user preference or automatic selection
 print(f"\n🎯 Strategy Selection Decision:")
 
 if user_strategy.lower() == 'auto':
     # Automatic selection - pick highest score
-    selected = max(strategies_evaluated.items(), key=lambda x: x[1]['score'])
-    selected_strategy = selected[0]
-    selection_reason = f"Auto-selected based on criteria (score: {selected[1]['score']})"
+    selected_strategy = max(strategies_evaluated, key=lambda k: strategies_evaluated[k]['score'])
+    selection_reason = f"Auto-selected based on criteria (score: {strategies_evaluated[selected_strategy]['score']})"
     
 elif user_strategy.upper() in ['FAST', 'WINDOWED', 'HYBRID']:
     selected_strategy = user_strategy.upper()
@@ -106,10 +93,10 @@ print(f"   Reason: {selection_reason}")
 # Define strategy-specific parameters
 if selected_strategy == 'FAST':
     strategy_params = {
-        'method': 'single_query_per_satellite',
-        'description': 'Single query per satellite over full time range',
+        'method': 'single_query_all_satellites',
+        'description': 'Single query for all satellites over full time range',
         'window_size_hours': None,
-        'expected_api_calls': num_satellites
+        'expected_api_calls': 1
     }
     
 elif selected_strategy == 'WINDOWED':
@@ -128,7 +115,7 @@ elif selected_strategy == 'WINDOWED':
         'description': f'Split into {window_hours}-hour windows based on {primary_regime} regime',
         'window_size_hours': window_hours,
         'expected_windows': num_windows,
-        'expected_api_calls': num_satellites * num_windows
+        'expected_api_calls': num_windows
     }
     
 else:  # HYBRID
@@ -139,12 +126,16 @@ else:  # HYBRID
         'expected_api_calls': 'variable (1-N)'
     }
 
-print(f"\n📋 Strategy Configuration:")
-print(f"   Method: {strategy_params['method']}")
-print(f"   Description: {strategy_params['description']}")
+# Build the configuration report and print it in one call
+report = []
+report.append(f"\n📋 Strategy Configuration:")
+report.append(f"   Method: {strategy_params['method']}")
+report.append(f"   Description: {strategy_params['description']}")
 for key, value in strategy_params.items():
     if key not in ['method', 'description']:
-        print(f"   {key.replace('_', ' ').title()}: {value}")
+        report.append(f"   {key.replace('_', ' ').title()}: {value}")
+
+print("\n".join(report))
 
 # Save strategy selection for next section
 print(f"\n📦 Saving strategy selection...")
@@ -161,8 +152,7 @@ strategy_data = {
     'evaluated_strategies': strategies_evaluated
 }
 
-with open('pipeline_strategy.json', 'w') as f:
-    json.dump(strategy_data, f, indent=2)
+pipeline_state.save('pipeline_strategy.json', strategy_data)
 
 print(f"   ✅ Strategy data saved to pipeline_strategy.json")
 
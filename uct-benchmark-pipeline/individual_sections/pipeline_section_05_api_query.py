@@ -2,9 +2,13 @@
 SECTION 5: API QUERY LAYER
 Executes the selected search strategy to retrieve data from UDL
 """
-import json
 import pandas as pd
-from datetime import datetime, timedelta
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pipeline_state
+import udl_auth
 
 print("="*80)
 print("SECTION 5: API QUERY LAYER")
@@ -12,16 +16,10 @@ print("="*80)
 
 # Load previous sections
 print("\n📥 Loading previous sections...")
-with open('pipeline_config.json', 'r') as f:
-    config = json.load(f)
-    
-with open('pipeline_auth.json', 'r') as f:
-    auth = json.load(f)
-    
-with open('pipeline_strategy.json', 'r') as f:
-    strategy = json.load(f)
+config = pipeline_state.load('pipeline_config.json')
+strategy = pipeline_state.load('pipeline_strategy.json')
 
-token = auth['token']
+token = udl_auth.get_token()
 satellite_ids = config['satellite_ids']
 start_time = datetime.fromisoformat(config['start_time'])
 end_time = datetime.fromisoformat(config['end_time'])
@@ -30,8 +28,35 @@ print(f"   ✅ Configuration: {len(satellite_ids)} satellites")
 print(f"   ✅ Authentication: Token ready")
 print(f"   ✅ Strategy: {strategy['selected_strategy']}")
 
-# Import API functions
-from uct_benchmark.api.apiIntegration import asyncUDLBatchQuery, datetimeToUDL
+# UDL takes a comma-separated satNo list, so each time range is one request
+# covering every satellite rather than one request per satellite
+sat_list = ','.join(map(str, satellite_ids))
+
+# Import API functions; the query functions are imported in the branch that uses them
+from uct_benchmark.api.apiIntegration import datetimeToUDL
+
+
+def make_windows(start, end, hours):
+    """Split [start, end) into consecutive windows of `hours`, the last one clipped to end"""
+    edges = list(pd.date_range(start, end, freq=f'{hours}h').to_pydatetime())
+    if not edges or edges[-1] != end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def concat_windows(frames):
+    """Stack per-window results via Arrow, copying rows once into the final frame"""
+    tables = [pa.Table.from_pandas(w, preserve_index=False) for w in frames if len(w) > 0]
+    if not tables:
+        return pd.DataFrame()
+    # Like pd.concat: windows missing a column get nulls, and a column that is
+    # int64 in one window and float64 in another (nulls in only some windows)
+    # is upcast to float64
+    return pa.concat_tables(tables, promote_options='permissive').to_pandas(self_destruct=True)
+
+
+# Full-range epoch filter, formatted once and shared by every branch below
+full_epoch = f"{datetimeToUDL(start_time)}..{datetimeToUDL(end_time)}"
 
 print(f"\n🚀 Executing {strategy['selected_strategy']} Strategy")
 print(f"   {strategy['strategy_params']['description']}")
@@ -39,19 +64,15 @@ print("="*80)
 
 # Execute selected strategy
 if strategy['selected_strategy'] == 'FAST':
-    # FAST Strategy: Single query per satellite
+    # FAST Strategy: Single query for all satellites
     print(f"\n📡 FAST Strategy Execution:")
     print(f"   Querying {len(satellite_ids)} satellites over full time range...")
     
-    sv_params = []
-    for sat in satellite_ids:
-        sv_params.append({
-            'satNo': str(sat),
-            'epoch': f"{datetimeToUDL(start_time)}..{datetimeToUDL(end_time)}"
-        })
+    # A single full-range request goes straight to UDL, without the batch machinery
+    from udl_client import udl_query_multi
     
-    print(f"   Making {len(sv_params)} API calls...")
-    sv_df = asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
+    print(f"   Making 1 API call...")
+    sv_df = udl_query_multi(token, 'statevector', satellite_ids, {'epoch': full_epoch})
     print(f"   ✅ Retrieved {len(sv_df)} state vectors")
 
 elif strategy['selected_strategy'] == 'WINDOWED':
@@ -63,44 +84,51 @@ elif strategy['selected_strategy'] == 'WINDOWED':
     print(f"   Time range: {start_time.date()} to {end_time.date()}")
     
     # Create time windows
-    windows = []
-    current = start_time
-    while current < end_time:
-        window_end = min(current + timedelta(hours=window_hours), end_time)
-        windows.append((current, window_end))
-        current = window_end
+    windows = make_windows(start_time, end_time, window_hours)
     
     print(f"   Created {len(windows)} time windows")
-    print(f"   Expected API calls: {len(windows) * len(satellite_ids)}")
+    print(f"   Expected API calls: {len(windows)}")
+    
+    from uct_benchmark.api.apiIntegration import asyncUDLBatchQuery
+    
+    # Windows are independent, so their round-trips overlap on a thread pool
+    max_concurrent = config.get('max_concurrent_windows', 8)
+    print(f"   Concurrent windows: {max_concurrent}")
+    
+    def query_window(window):
+        win_start, win_end = window
+        sv_params = [{
+            'satNo': sat_list,
+            'epoch': f"{datetimeToUDL(win_start)}..{datetimeToUDL(win_end)}"
+        }]
+        try:
+            return asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5), None
+        except Exception as e:
+            return None, e
     
-    # Query each window
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        results = list(executor.map(query_window, windows))
+    
+    # Report each window in order
     all_sv_data = []
     
-    for i, (win_start, win_end) in enumerate(windows, 1):
+    for i, ((win_start, win_end), (window_data, error)) in enumerate(zip(windows, results), 1):
         # Show progress every 5 windows
         if i % 5 == 1 or i == len(windows):
             print(f"\n   Window {i}/{len(windows)}: {win_start.date()} to {win_end.date()}")
         
-        sv_params = []
-        for sat in satellite_ids:
-            sv_params.append({
-                'satNo': str(sat),
-                'epoch': f"{datetimeToUDL(win_start)}..{datetimeToUDL(win_end)}"
-            })
-        
-        try:
-            window_data = asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
-            all_sv_data.append(window_data)
-            
-            if i % 5 == 1 or i == len(windows):
-                print(f"      Retrieved {len(window_data)} records")
-        except Exception as e:
-            print(f"      ⚠️ Window {i} failed: {e}")
+        if error is not None:
+            print(f"      ⚠️ Window {i} failed: {error}")
             continue
+        
+        all_sv_data.append(window_data)
+        
+        if i % 5 == 1 or i == len(windows):
+            print(f"      Retrieved {len(window_data)} records")
     
     # Combine all windows
     if all_sv_data:
-        sv_df = pd.concat(all_sv_data, ignore_index=True)
+        sv_df = concat_windows(all_sv_data)
         print(f"\n   ✅ Total retrieved: {len(sv_df)} state vectors across {len(windows)} windows")
     else:
         sv_df = pd.DataFrame()
@@ -111,16 +139,16 @@ else:  # HYBRID
     print(f"\n📡 HYBRID Strategy Execution:")
     print(f"   Step 1: Checking expected record count...")
     
-    from uct_benchmark.api.apiIntegration import UDLQuery
+    from udl_client import udl_probe_count
     
-    # Query count for first satellite to estimate
+    # Probe the count for the first satellite to estimate
     test_params = {
         'satNo': str(satellite_ids[0]),
-        'epoch': f"{datetimeToUDL(start_time)}..{datetimeToUDL(end_time)}"
+        'epoch': full_epoch
     }
     
     try:
-        test_count = UDLQuery(token, 'statevector', test_params, count=True)
+        test_count = udl_probe_count(token, 'statevector', test_params)
         estimated_total = test_count * len(satellite_ids)
         print(f"      Sample count: {test_count} (satellite {satellite_ids[0]})")
         print(f"      Estimated total: ~{estimated_total}")
@@ -135,36 +163,26 @@ else:  # HYBRID
         
         # Use 24-hour windows for GEO
         window_hours = 24
-        windows = []
-        current = start_time
-        while current < end_time:
-            window_end = min(current + timedelta(hours=window_hours), end_time)
-            windows.append((current, window_end))
-            current = window_end
+        windows = make_windows(start_time, end_time, window_hours)
+        
+        from uct_benchmark.api.apiIntegration import asyncUDLBatchQuery
         
         all_sv_data = []
         for win_start, win_end in windows:
-            sv_params = []
-            for sat in satellite_ids:
-                sv_params.append({
-                    'satNo': str(sat),
-                    'epoch': f"{datetimeToUDL(win_start)}..{datetimeToUDL(win_end)}"
-                })
+            sv_params = [{
+                'satNo': sat_list,
+                'epoch': f"{datetimeToUDL(win_start)}..{datetimeToUDL(win_end)}"
+            }]
             window_data = asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
             all_sv_data.append(window_data)
         
-        sv_df = pd.concat(all_sv_data, ignore_index=True)
+        sv_df = concat_windows(all_sv_data)
     else:
         print(f"\n   Step 2: Count ≤ {threshold} → Using direct query")
         
-        sv_params = []
-        for sat in satellite_ids:
-            sv_params.append({
-                'satNo': str(sat),
-                'epoch': f"{datetimeToUDL(start_time)}..{datetimeToUDL(end_time)}"
-            })
+        from udl_client import udl_query_multi
         
-        sv_df = asyncUDLBatchQuery(token, 'statevector', sv_params, dt=0.5)
+        sv_df = udl_query_multi(token, 'statevector', satellite_ids, {'epoch': full_epoch})
     
     print(f"   ✅ Retrieved {len(sv_df)} state vectors")
 
@@ -172,39 +190,52 @@ else:  # HYBRID
 print(f"\n📊 Retrieved Data Summary:")
 print(f"   Total records: {len(sv_df)}")
 
+unique_sats = []
+columns = []
+
 if len(sv_df) > 0:
-    print(f"   Satellites in data: {sorted(sv_df['satNo'].unique())}")
+    # One pass over satNo feeds the summary, the breakdown and the metadata
+    sat_counts = sv_df['satNo'].value_counts(sort=False)
+    unique_sats = sat_counts.index.tolist()
+    columns = sv_df.columns.tolist()
+    
+    print(f"   Satellites in data: {sorted(sat_counts.index)}")
     print(f"   Time range: {sv_df['epoch'].min()} to {sv_df['epoch'].max()}")
     
     # Per-satellite breakdown
     print(f"\n   Per-Satellite Breakdown:")
     for sat in satellite_ids:
-        sat_data = sv_df[sv_df['satNo'] == sat]
-        if len(sat_data) > 0:
-            print(f"      Satellite {sat}: {len(sat_data)} records")
+        n_records = sat_counts.get(sat, 0)
+        if n_records > 0:
+            print(f"      Satellite {sat}: {n_records} records")
         else:
             print(f"      Satellite {sat}: 0 records (no data)")
 
 # Save retrieved data
 print(f"\n📦 Saving retrieved data...")
 
-# Save DataFrame
-sv_df.to_csv('pipeline_state_vectors.csv', index=False)
-print(f"   ✅ State vectors saved to pipeline_state_vectors.csv")
+# Save DataFrame as Parquet: binary, compressed and dtype-preserving, so
+# Section 6 skips re-parsing floats from text
+pipeline_state.save_frame('pipeline_state_vectors.parquet', sv_df, checkpoint=True)
+print(f"   ✅ State vectors saved to pipeline_state_vectors.parquet")
+
+if config.get('export_csv', False):
+    sv_df.to_csv('pipeline_state_vectors.csv', index=False)
+    print(f"   ✅ State vectors also exported to pipeline_state_vectors.csv")
 
 # Save metadata
 query_metadata = {
     'strategy_used': strategy['selected_strategy'],
     'total_records': len(sv_df),
     'satellites_queried': satellite_ids,
-    'satellites_with_data': sv_df['satNo'].unique().tolist() if len(sv_df) > 0 else [],
+    'satellites_with_data': unique_sats,
     'time_range_start': start_time.isoformat(),
     'time_range_end': end_time.isoformat(),
-    'columns': sv_df.columns.tolist() if len(sv_df) > 0 else []
+    'columns': columns
 }
 
-with open('pipeline_query_metadata.json', 'w') as f:
-    json.dump(query_metadata, f, indent=2)
+# Section 6 runs separately and reads this file, so always write it
+pipeline_state.save('pipeline_query_metadata.json', query_metadata, checkpoint=True)
 
 print(f"   ✅ Query metadata saved to pipeline_query_metadata.json")
 
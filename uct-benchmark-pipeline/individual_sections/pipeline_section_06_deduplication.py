@@ -2,20 +2,24 @@
 SECTION 6: DEDUPLICATION & VALIDATION
 Removes duplicates and validates data quality
 """
-import json
+import numpy as np
 import pandas as pd
 
+import pipeline_state
+
 print("="*80)
 print("SECTION 6: DEDUPLICATION & VALIDATION")
 print("="*80)
 
 # Load retrieved data
 print("\n📥 Loading retrieved data from Section 5...")
-sv_df = pd.read_csv('pipeline_state_vectors.csv')
-sv_df['epoch'] = pd.to_datetime(sv_df['epoch'])
+sv_df = pipeline_state.load_frame('pipeline_state_vectors.parquet')
+# UDL epochs are ISO 8601 but do not always carry fractional seconds, which
+# a format inferred from the first row would reject
+sv_df['epoch'] = pd.to_datetime(sv_df['epoch'], format='ISO8601')
 
-with open('pipeline_query_metadata.json', 'r') as f:
-    query_meta = json.load(f)
+query_meta = pipeline_state.load('pipeline_query_metadata.json')
+config = pipeline_state.load('pipeline_config.json')
 
 print(f"   ✅ Loaded {len(sv_df)} state vectors")
 print(f"   Strategy used: {query_meta['strategy_used']}")
@@ -29,9 +33,10 @@ print(f"   Before deduplication: {len(sv_df)} records")
 # Natural key: satellite + epoch (unique identifier)
 print(f"   Deduplication key: satNo + epoch")
 
-# Check for duplicates
+# Each step narrows one row mask; the frame itself is sliced once, after Step 4
 duplicates = sv_df.duplicated(subset=['satNo', 'epoch'], keep='first')
 num_duplicates = duplicates.sum()
+keep = ~duplicates.to_numpy()
 
 print(f"   Found {num_duplicates} duplicate records")
 
@@ -42,13 +47,11 @@ if num_duplicates > 0:
     for _, row in dup_rows.iterrows():
         print(f"      Satellite {row['satNo']}, Epoch {row['epoch']}")
     
-    # Remove duplicates
-    sv_df = sv_df.drop_duplicates(subset=['satNo', 'epoch'], keep='first')
     print(f"\n   ✅ Removed {num_duplicates} duplicates")
 else:
     print(f"   ✅ No duplicates found")
 
-print(f"   After deduplication: {len(sv_df)} records")
+print(f"   After deduplication: {keep.sum()} records")
 
 # Step 2: Validate Required Fields
 print(f"\n📊 STEP 2: Field Validation")
@@ -63,23 +66,22 @@ else:
 
 # Check for null values in critical fields
 print(f"\n   Checking for null values in critical fields...")
+present_fields = [f for f in required_fields if f in sv_df.columns]
+is_null = sv_df[present_fields].isna().to_numpy() & keep[:, None]
 null_counts = {}
-for field in required_fields:
-    if field in sv_df.columns:
-        null_count = sv_df[field].isna().sum()
-        null_counts[field] = null_count
-        if null_count > 0:
-            print(f"      ⚠️ {field}: {null_count} null values")
+for field, null_count in zip(present_fields, is_null.sum(axis=0)):
+    null_counts[field] = null_count
+    if null_count > 0:
+        print(f"      ⚠️ {field}: {null_count} null values")
 
 total_nulls = sum(null_counts.values())
 if total_nulls == 0:
     print(f"   ✅ No null values in critical fields")
 else:
     print(f"\n   Removing records with null critical values...")
-    sv_df_clean = sv_df.dropna(subset=required_fields)
-    removed = len(sv_df) - len(sv_df_clean)
-    print(f"   ✅ Removed {removed} records with null values")
-    sv_df = sv_df_clean
+    has_null = is_null.any(axis=1)
+    print(f"   ✅ Removed {has_null.sum()} records with null values")
+    keep &= ~has_null
 
 # Step 3: Range Validation
 print(f"\n📊 STEP 3: Range Validation")
@@ -87,8 +89,10 @@ print(f"\n📊 STEP 3: Range Validation")
 # Validate position vectors (should be reasonable Earth orbit distances)
 print(f"   Validating position vectors...")
 
-# Calculate distance from Earth center
-sv_df['distance_km'] = (sv_df['xpos']**2 + sv_df['ypos']**2 + sv_df['zpos']**2)**0.5
+# Calculate distance from Earth center: row-wise dot product in one pass,
+# no temporary Series per squared component
+pos = sv_df[['xpos', 'ypos', 'zpos']].to_numpy(dtype=np.float64)
+sv_df['distance_km'] = np.sqrt(np.einsum('ij,ij->i', pos, pos))
 
 # Reasonable ranges:
 # LEO: 6,378 - 8,378 km
@@ -96,9 +100,14 @@ sv_df['distance_km'] = (sv_df['xpos']**2 + sv_df['ypos']**2 + sv_df['zpos']**2)*
 # GEO: 35,786 - 45,000 km
 # HEO: can vary widely
 
-min_distance = sv_df['distance_km'].min()
-max_distance = sv_df['distance_km'].max()
-mean_distance = sv_df['distance_km'].mean()
+distance = sv_df['distance_km'].to_numpy()[keep]
+if keep.any():
+    min_distance = distance.min()
+    max_distance = distance.max()
+    mean_distance = distance.mean()
+else:
+    # no records left: report NaN as the Series stats did
+    min_distance = max_distance = mean_distance = np.nan
 
 print(f"   Distance from Earth center:")
 print(f"      Min: {min_distance:,.1f} km")
@@ -106,26 +115,32 @@ print(f"      Max: {max_distance:,.1f} km")
 print(f"      Mean: {mean_distance:,.1f} km")
 
 # Flag suspicious distances (too close to Earth or too far)
-suspicious_low = sv_df[sv_df['distance_km'] < 6378]  # Below Earth surface
-suspicious_high = sv_df[sv_df['distance_km'] > 100000]  # Beyond typical orbits
+# These are warnings only; the records stay in the data
+num_suspicious_low = (distance < 6378).sum()  # Below Earth surface
+num_suspicious_high = (distance > 100000).sum()  # Beyond typical orbits
 
-if len(suspicious_low) > 0:
-    print(f"   ⚠️ Warning: {len(suspicious_low)} records below Earth surface!")
+if num_suspicious_low > 0:
+    print(f"   ⚠️ Warning: {num_suspicious_low} records below Earth surface!")
     
-if len(suspicious_high) > 0:
-    print(f"   ⚠️ Warning: {len(suspicious_high)} records beyond 100,000 km!")
+if num_suspicious_high > 0:
+    print(f"   ⚠️ Warning: {num_suspicious_high} records beyond 100,000 km!")
 
-if len(suspicious_low) == 0 and len(suspicious_high) == 0:
+if num_suspicious_low == 0 and num_suspicious_high == 0:
     print(f"   ✅ All positions within reasonable orbital ranges")
 
 # Validate velocity vectors (should be reasonable orbital velocities)
 print(f"\n   Validating velocity vectors...")
 
-sv_df['velocity_km_s'] = (sv_df['xvel']**2 + sv_df['yvel']**2 + sv_df['zvel']**2)**0.5
+vel = sv_df[['xvel', 'yvel', 'zvel']].to_numpy(dtype=np.float64)
+sv_df['velocity_km_s'] = np.sqrt(np.einsum('ij,ij->i', vel, vel))
 
-min_velocity = sv_df['velocity_km_s'].min()
-max_velocity = sv_df['velocity_km_s'].max()
-mean_velocity = sv_df['velocity_km_s'].mean()
+velocity = sv_df['velocity_km_s'].to_numpy()[keep]
+if keep.any():
+    min_velocity = velocity.min()
+    max_velocity = velocity.max()
+    mean_velocity = velocity.mean()
+else:
+    min_velocity = max_velocity = mean_velocity = np.nan
 
 print(f"   Velocity magnitude:")
 print(f"      Min: {min_velocity:.3f} km/s")
@@ -133,10 +148,10 @@ print(f"      Max: {max_velocity:.3f} km/s")
 print(f"      Mean: {mean_velocity:.3f} km/s")
 
 # Typical orbital velocities: 1-8 km/s
-suspicious_velocity = sv_df[(sv_df['velocity_km_s'] < 0.5) | (sv_df['velocity_km_s'] > 12)]
+num_suspicious_velocity = ((velocity < 0.5) | (velocity > 12)).sum()
 
-if len(suspicious_velocity) > 0:
-    print(f"   ⚠️ Warning: {len(suspicious_velocity)} records with unusual velocities!")
+if num_suspicious_velocity > 0:
+    print(f"   ⚠️ Warning: {num_suspicious_velocity} records with unusual velocities!")
 else:
     print(f"   ✅ All velocities within reasonable ranges")
 
@@ -144,27 +159,35 @@ else:
 print(f"\n📊 STEP 4: TLE Availability Check")
 
 # Load TLE data
-tle_df = pd.read_csv('data/referenceTLEs_.csv')
-satellites_with_tle = tle_df['satNo'].unique()
+# Only satNo is needed here; a set makes each membership check O(1)
+tle_df = pipeline_state.load_reference('data/referenceTLEs_.csv', columns=['satNo'])
+satellites_with_tle = set(tle_df['satNo'].unique().tolist())
 
 print(f"   Checking TLE availability...")
-sv_satellites = sv_df['satNo'].unique()
-
-for sat in sv_satellites:
-    if sat in satellites_with_tle:
-        print(f"      Satellite {sat}: ✅ TLE available")
-    else:
-        print(f"      Satellite {sat}: ❌ No TLE data")
+sv_satellites = sv_df['satNo'][keep].unique()
+sat_has_tle = [sat in satellites_with_tle for sat in sv_satellites.tolist()]
+
+# One summary line; the per-satellite list only on request
+report = [f"      {sum(sat_has_tle)}/{len(sv_satellites)} satellites have TLE data"]
+if config.get('verbose', False):
+    for sat, hit in zip(sv_satellites, sat_has_tle):
+        report.append(f"      Satellite {sat}: {'✅ TLE available' if hit else '❌ No TLE data'}")
+else:
+    missing = [sat for sat, hit in zip(sv_satellites.tolist(), sat_has_tle) if not hit]
+    if missing:
+        report.append(f"      ❌ No TLE data: {missing}")
+print("\n".join(report))
 
-sv_df_with_tle = sv_df[sv_df['satNo'].isin(satellites_with_tle)]
-removed_no_tle = len(sv_df) - len(sv_df_with_tle)
+has_tle = sv_df['satNo'].isin(satellites_with_tle).to_numpy()
+removed_no_tle = (keep & ~has_tle).sum()
+keep &= has_tle
 
 if removed_no_tle > 0:
     print(f"\n   ⚠️ Removed {removed_no_tle} records without TLE data")
 else:
     print(f"\n   ✅ All satellites have TLE data")
 
-sv_df = sv_df_with_tle
+sv_df = sv_df[keep]
 
 # Final Summary
 print(f"\n📊 VALIDATION SUMMARY:")
@@ -178,15 +201,21 @@ print(f"   Final valid records: {len(sv_df)}")
 print(f"   Retention rate: {len(sv_df)/original_count*100:.1f}%")
 
 print(f"\n   Final Per-Satellite Breakdown:")
-for sat in sorted(sv_df['satNo'].unique()):
-    sat_count = len(sv_df[sv_df['satNo'] == sat])
+for sat, sat_count in sv_df.groupby('satNo').size().items():
     print(f"      Satellite {sat}: {sat_count} records")
 
 # Save validated data
 print(f"\n📦 Saving validated data...")
 
-sv_df.to_csv('pipeline_validated_data.csv', index=False)
-print(f"   ✅ Validated data saved to pipeline_validated_data.csv")
+# Parquet keeps the parsed epochs and exact floats, so Section 7 reads the
+# frame back without parsing text; run_sections_6_to_8.py skips the file and
+# hands the frame over in memory
+pipeline_state.save_frame('pipeline_validated_data.parquet', sv_df)
+print(f"   ✅ Validated data saved to pipeline_validated_data.parquet")
+
+if config.get('export_csv', False):
+    sv_df.to_csv('pipeline_validated_data.csv', index=False)
+    print(f"   ✅ Validated data also exported to pipeline_validated_data.csv")
 
 validation_metadata = {
     'original_count': original_count,
@@ -199,14 +228,13 @@ validation_metadata = {
     'validation_checks': {
         'required_fields': 'passed' if not missing_fields else 'failed',
         'null_values': 'passed' if total_nulls == 0 else 'warning',
-        'position_range': 'passed' if len(suspicious_low) == 0 and len(suspicious_high) == 0 else 'warning',
-        'velocity_range': 'passed' if len(suspicious_velocity) == 0 else 'warning',
+        'position_range': 'passed' if num_suspicious_low == 0 and num_suspicious_high == 0 else 'warning',
+        'velocity_range': 'passed' if num_suspicious_velocity == 0 else 'warning',
         'tle_availability': 'passed' if removed_no_tle == 0 else 'warning'
     }
 }
 
-with open('pipeline_validation_metadata.json', 'w') as f:
-    json.dump(validation_metadata, f, indent=2)
+pipeline_state.save('pipeline_validation_metadata.json', validation_metadata)
 
 print(f"   ✅ Validation metadata saved to pipeline_validation_metadata.json")
 
@@ -2,9 +2,10 @@
 SECTION 7: TRACK BINNING
 Groups observations into tracks based on time gaps
 """
-import json
 import pandas as pd
-import numpy as np
+
+import pipeline_state
+import tracks
 
 print("="*80)
 print("SECTION 7: TRACK BINNING")
@@ -12,11 +13,11 @@ print("="*80)
 
 # Load validated data
 print("\n📥 Loading validated data from Section 6...")
-sv_df = pd.read_csv('pipeline_validated_data.csv')
-sv_df['epoch'] = pd.to_datetime(sv_df['epoch'])
+sv_df = pipeline_state.load_frame('pipeline_validated_data.parquet')
+
+val_meta = pipeline_state.load('pipeline_validation_metadata.json')
 
-with open('pipeline_validation_metadata.json', 'r') as f:
-    val_meta = json.load(f)
+config = pipeline_state.load('pipeline_config.json')
 
 print(f"   ✅ Loaded {len(sv_df)} validated state vectors")
 print(f"   Satellites: {val_meta['satellites']}")
@@ -27,22 +28,18 @@ tle_df = pd.read_csv('data/referenceTLEs_.csv')
 # Convert state vectors to observation-like format
 print(f"\n📊 Converting state vectors to observation format...")
 
-obs_list = []
-for _, row in sv_df.iterrows():
-    obs = {
-        'satNo': row['satNo'],
-        'obTime': row['epoch'],
-        'idSensor': 'STATE_VECTOR',
-        'senlat': 0.0,
-        'senlon': 0.0,
-        'senalt': 0.0,
-        'ra': 0.0,
-        'declination': 0.0,
-        'range': row['distance_km'] if 'distance_km' in row else 0.0
-    }
-    obs_list.append(obs)
-
-obs_df = pd.DataFrame(obs_list)
+# Whole columns at once; scalars broadcast to every row
+obs_df = pd.DataFrame({
+    'satNo': sv_df['satNo'],
+    'obTime': sv_df['epoch'],
+    'idSensor': 'STATE_VECTOR',
+    'senlat': 0.0,
+    'senlon': 0.0,
+    'senalt': 0.0,
+    'ra': 0.0,
+    'declination': 0.0,
+    'range': sv_df['distance_km'] if 'distance_km' in sv_df.columns else 0.0
+})
 print(f"   ✅ Created {len(obs_df)} observation records")
 
 # Track binning using the module's binTracks function
@@ -64,16 +61,21 @@ try:
     if 'trackId' in binned_df.columns:
         print(f"\n   ✅ Track binning successful!")
         
+        # Track sizes, computed once: overall for the < 3 obs filter below,
+        # and per satellite for the breakdown
+        track_sizes = binned_df.groupby('trackId').size()
+        sat_track_sizes = binned_df.groupby(['satNo', 'trackId']).size()
+        
         # Analyze tracks
-        num_tracks = binned_df['trackId'].nunique()
+        num_tracks = len(track_sizes)
         print(f"\n📊 Track Analysis:")
         print(f"   Total tracks created: {num_tracks}")
         
         # Per-satellite track breakdown
         print(f"\n   Per-Satellite Track Breakdown:")
-        for sat in sorted(binned_df['satNo'].unique()):
-            sat_data = binned_df[binned_df['satNo'] == sat]
-            sat_tracks = sat_data['trackId'].nunique()
+        for sat, sat_data in binned_df.groupby('satNo'):
+            sat_sizes = sat_track_sizes.loc[sat]
+            sat_tracks = len(sat_sizes)
             sat_obs = len(sat_data)
             
             print(f"\n      Satellite {sat}:")
@@ -82,28 +84,21 @@ try:
             print(f"         Avg obs/track: {sat_obs/sat_tracks:.1f}")
             
             # Show track details
-            track_sizes = sat_data.groupby('trackId').size()
-            print(f"         Track size range: {track_sizes.min()}-{track_sizes.max()} obs")
+            print(f"         Track size range: {sat_sizes.min()}-{sat_sizes.max()} obs")
             
-            # Calculate gaps within tracks
+            # Calculate gaps within tracks: diff within each track, so the first
+            # observation of every track has no gap
             sat_sorted = sat_data.sort_values('obTime')
-            sat_sorted['gap_hours'] = sat_sorted['obTime'].diff().dt.total_seconds() / 3600
+            track_gaps = sat_sorted.groupby('trackId')['obTime'].diff().dt.total_seconds() / 3600
+            track_gaps = track_gaps.dropna()
             
-            # Filter to gaps within same track
-            track_gaps = []
-            for track_id in sat_data['trackId'].unique():
-                track_data = sat_sorted[sat_sorted['trackId'] == track_id].copy()
-                if len(track_data) > 1:
-                    track_data['gap'] = track_data['obTime'].diff().dt.total_seconds() / 3600
-                    track_gaps.extend(track_data['gap'].dropna().tolist())
-            
-            if track_gaps:
-                print(f"         Intra-track gaps: {np.mean(track_gaps):.1f}h mean, {np.max(track_gaps):.1f}h max")
+            if len(track_gaps) > 0:
+                print(f"         Intra-track gaps: {track_gaps.mean():.1f}h mean, {track_gaps.max():.1f}h max")
         
         # Overall gap analysis
         print(f"\n   Overall Gap Analysis:")
         binned_sorted = binned_df.sort_values(['satNo', 'obTime'])
-        binned_sorted['gap_hours'] = binned_sorted.groupby('satNo')['obTime'].diff().dt.total_seconds() / 3600
+        binned_sorted['gap_hours'] = tracks.gap_hours(binned_sorted, time_col='obTime')
         
         gaps = binned_sorted['gap_hours'].dropna()
         if len(gaps) > 0:
@@ -132,7 +127,6 @@ except Exception as e:
 if 'trackId' in binned_df.columns:
     print(f"\n📊 Filtering tracks with < 3 observations...")
     
-    track_sizes = binned_df.groupby('trackId').size()
     small_tracks = track_sizes[track_sizes < 3]
     
     if len(small_tracks) > 0:
@@ -143,15 +137,20 @@ if 'trackId' in binned_df.columns:
         
         print(f"   ✅ Removed {len(small_tracks)} small tracks")
         print(f"   Remaining observations: {len(binned_df)}")
-        print(f"   Remaining tracks: {binned_df['trackId'].nunique()}")
+        print(f"   Remaining tracks: {len(track_sizes) - len(small_tracks)}")
     else:
         print(f"   ✅ All tracks have ≥ 3 observations")
 
 # Save binned data
 print(f"\n📦 Saving binned data...")
 
-binned_df.to_csv('pipeline_binned_data.csv', index=False)
-print(f"   ✅ Binned data saved to pipeline_binned_data.csv")
+# Section 9 reads this file, so it is written even from run_sections_6_to_8.py
+pipeline_state.save_frame('pipeline_binned_data.parquet', binned_df, checkpoint=True)
+print(f"   ✅ Binned data saved to pipeline_binned_data.parquet")
+
+if config.get('export_csv', False):
+    binned_df.to_csv('pipeline_binned_data.csv', index=False)
+    print(f"   ✅ Binned data also exported to pipeline_binned_data.csv")
 
 binning_metadata = {
     'input_observations': len(obs_df),
@@ -163,15 +162,16 @@ binning_metadata = {
 }
 
 if 'trackId' in binned_df.columns:
-    for sat in binned_df['satNo'].unique():
-        sat_data = binned_df[binned_df['satNo'] == sat]
+    sat_summary = binned_df.groupby('satNo', sort=False).agg(
+        n_obs=('trackId', 'size'), n_tracks=('trackId', 'nunique')
+    )
+    for sat, row in sat_summary.iterrows():
         binning_metadata['per_satellite'][int(sat)] = {
-            'tracks': int(sat_data['trackId'].nunique()),
-            'observations': int(len(sat_data))
+            'tracks': int(row['n_tracks']),
+            'observations': int(row['n_obs'])
         }
 
-with open('pipeline_binning_metadata.json', 'w') as f:
-    json.dump(binning_metadata, f, indent=2)
+pipeline_state.save('pipeline_binning_metadata.json', binning_metadata)
 
 print(f"   ✅ Binning metadata saved to pipeline_binning_metadata.json")
 
@@ -2,18 +2,26 @@
 SECTION 7: TRACK BINNING (FIXED)
 Groups observations into tracks based on time gaps - Manual approach
 """
-import json
 import pandas as pd
 import numpy as np
 
+import pipeline_state
+import tracks
+
+# With copy-on-write, adding columns to a filtered frame needs no defensive
+# .copy() first (pandas 3 always works this way and deprecates the option)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 print("="*80)
 print("SECTION 7: TRACK BINNING")
 print("="*80)
 
 # Load validated data
 print("\n📥 Loading validated data from Section 6...")
-sv_df = pd.read_csv('pipeline_validated_data.csv')
-sv_df['epoch'] = pd.to_datetime(sv_df['epoch'])
+sv_df = pipeline_state.load_frame('pipeline_validated_data.parquet')
+
+config = pipeline_state.load('pipeline_config.json')
 
 print(f"   ✅ Loaded {len(sv_df)} validated state vectors")
 
@@ -23,57 +31,31 @@ print(f"   Gap threshold: 90 minutes (1.5 hours)")
 print(f"   Logic: Gap > 90 min → New track")
 
 # Sort by satellite and time
-sv_df = sv_df.sort_values(['satNo', 'epoch']).reset_index(drop=True)
-
-# Initialize track IDs
-sv_df['trackId'] = None
-current_track_id = 1
-
-for sat in sv_df['satNo'].unique():
+sv_df = sv_df.sort_values(['satNo', 'epoch'], kind='stable', ignore_index=True)
+
+# New track at each satellite's first observation or after a gap > 90 minutes;
+# the running count of track starts is the trackId, numbered across satellites
+gap_hours = tracks.gap_hours(sv_df)
+new_track = np.isnan(gap_hours) | (gap_hours > 1.5)
+sv_df['trackId'] = np.cumsum(new_track, dtype=np.int32)
+
+# Observations per (satellite, track), computed once and reused by every
+# summary below; trackIds never repeat across satellites
+track_sizes = sv_df.groupby(['satNo', 'trackId']).size()
+sat_summary = track_sizes.groupby(level='satNo').agg(n_obs='sum', n_tracks='size')
+for sat, row in sat_summary.iterrows():
     print(f"\n   Processing Satellite {sat}...")
-    
-    sat_mask = sv_df['satNo'] == sat
-    sat_indices = sv_df[sat_mask].index
-    
-    # First observation starts first track
-    sv_df.loc[sat_indices[0], 'trackId'] = current_track_id
-    current_sat_track = current_track_id
-    
-    # Process subsequent observations
-    for i in range(1, len(sat_indices)):
-        prev_idx = sat_indices[i-1]
-        curr_idx = sat_indices[i]
-        
-        # Calculate time gap
-        time_gap = (sv_df.loc[curr_idx, 'epoch'] - sv_df.loc[prev_idx, 'epoch']).total_seconds() / 3600  # hours
-        
-        # If gap > 90 minutes, start new track
-        if time_gap > 1.5:
-            current_track_id += 1
-            current_sat_track = current_track_id
-        
-        sv_df.loc[curr_idx, 'trackId'] = current_sat_track
-    
-    # Summary for this satellite
-    sat_data = sv_df[sat_mask]
-    num_tracks = sat_data['trackId'].nunique()
-    print(f"      Created {num_tracks} tracks from {len(sat_data)} observations")
-    
-    current_track_id += 1  # Move to next satellite's tracks
-
-# Convert trackId to integer
-sv_df['trackId'] = sv_df['trackId'].astype(int)
+    print(f"      Created {row['n_tracks']} tracks from {row['n_obs']} observations")
 
 # Analyze tracks
 print(f"\n📊 Track Analysis:")
-num_tracks = sv_df['trackId'].nunique()
+num_tracks = len(track_sizes)
 print(f"   Total tracks created: {num_tracks}")
 
 # Per-satellite breakdown
 print(f"\n   Per-Satellite Track Breakdown:")
-for sat in sorted(sv_df['satNo'].unique()):
-    sat_data = sv_df[sv_df['satNo'] == sat].copy()
-    sat_tracks = sat_data['trackId'].nunique()
+for sat, sat_data in sv_df.groupby('satNo'):
+    sat_tracks = sat_summary.at[sat, 'n_tracks']
     sat_obs = len(sat_data)
     
     print(f"\n      Satellite {sat}:")
@@ -81,42 +63,40 @@ for sat in sorted(sv_df['satNo'].unique()):
     print(f"         Observations: {sat_obs}")
     print(f"         Avg obs/track: {sat_obs/sat_tracks:.1f}")
     
-    # Track size distribution
-    track_sizes = sat_data.groupby('trackId').size()
-    print(f"         Track sizes: {track_sizes.min()}-{track_sizes.max()} obs")
+    # Track size distribution: size and time span of every track in one pass
+    track_stats = sat_data.groupby('trackId', sort=False)['epoch'].agg(['size', 'min', 'max'])
+    track_hours = (track_stats['max'] - track_stats['min']).dt.total_seconds() / 3600
+    print(f"         Track sizes: {track_stats['size'].min()}-{track_stats['size'].max()} obs")
     print(f"         Track size distribution:")
-    for track_id in sat_data['trackId'].unique():
-        track_obs = len(sat_data[sat_data['trackId'] == track_id])
-        track_start = sat_data[sat_data['trackId'] == track_id]['epoch'].min()
-        track_end = sat_data[sat_data['trackId'] == track_id]['epoch'].max()
-        duration = (track_end - track_start).total_seconds() / 3600
+    for track_id, track_obs, duration in zip(track_stats.index, track_stats['size'], track_hours):
         print(f"            Track {track_id}: {track_obs} obs, {duration:.1f}h duration")
 
 # Filter tracks with < 3 observations
 print(f"\n📊 Filtering tracks with < 3 observations...")
 
-track_sizes = sv_df.groupby('trackId').size()
-small_tracks = track_sizes[track_sizes < 3]
+is_small = track_sizes < 3
+small_tracks = track_sizes[is_small]
 
 if len(small_tracks) > 0:
     print(f"   Found {len(small_tracks)} tracks with < 3 observations:")
-    for track_id, size in small_tracks.items():
+    for (_, track_id), size in small_tracks.items():
         print(f"      Track {track_id}: {size} obs")
     
     # Remove small tracks
     original_count = len(sv_df)
-    sv_df = sv_df[~sv_df['trackId'].isin(small_tracks.index)].copy()
+    sv_df = sv_df[~sv_df['trackId'].isin(small_tracks.index.get_level_values('trackId'))]
+    track_sizes = track_sizes[~is_small]
     
     print(f"\n   ✅ Removed {len(small_tracks)} small tracks")
     print(f"   Removed {original_count - len(sv_df)} observations")
     print(f"   Remaining observations: {len(sv_df)}")
-    print(f"   Remaining tracks: {sv_df['trackId'].nunique()}")
+    print(f"   Remaining tracks: {len(track_sizes)}")
 else:
     print(f"   ✅ All tracks have ≥ 3 observations")
 
 # Gap analysis
 print(f"\n📊 Gap Analysis:")
-sv_df['gap_hours'] = sv_df.groupby('satNo')['epoch'].diff().dt.total_seconds() / 3600
+sv_df['gap_hours'] = tracks.gap_hours(sv_df)
 
 gaps = sv_df['gap_hours'].dropna()
 if len(gaps) > 0:
@@ -132,32 +112,36 @@ if len(gaps) > 0:
 # Save binned data
 print(f"\n📦 Saving binned data...")
 
-sv_df.to_csv('pipeline_binned_data.csv', index=False)
-print(f"   ✅ Binned data saved to pipeline_binned_data.csv")
+# Section 9 reads this file, so it is written even from run_sections_6_to_8.py
+pipeline_state.save_frame('pipeline_binned_data.parquet', sv_df, checkpoint=True)
+print(f"   ✅ Binned data saved to pipeline_binned_data.parquet")
+
+if config.get('export_csv', False):
+    sv_df.to_csv('pipeline_binned_data.csv', index=False)
+    print(f"   ✅ Binned data also exported to pipeline_binned_data.csv")
 
 binning_metadata = {
     'input_observations': 93,
     'output_observations': len(sv_df),
-    'tracks_created': int(sv_df['trackId'].nunique()),
+    'tracks_created': len(track_sizes),
     'small_tracks_removed': int(len(small_tracks)) if len(small_tracks) > 0 else 0,
     'has_track_ids': True,
     'satellites': sv_df['satNo'].unique().tolist(),
     'per_satellite': {}
 }
 
-for sat in sv_df['satNo'].unique():
-    sat_data = sv_df[sv_df['satNo'] == sat]
+sat_summary = track_sizes.groupby(level='satNo').agg(n_obs='sum', n_tracks='size')
+for sat, row in sat_summary.iterrows():
     binning_metadata['per_satellite'][int(sat)] = {
-        'tracks': int(sat_data['trackId'].nunique()),
-        'observations': int(len(sat_data))
+        'tracks': int(row['n_tracks']),
+        'observations': int(row['n_obs'])
     }
 
-with open('pipeline_binning_metadata.json', 'w') as f:
-    json.dump(binning_metadata, f, indent=2)
+pipeline_state.save('pipeline_binning_metadata.json', binning_metadata)
 
 print(f"   ✅ Binning metadata saved to pipeline_binning_metadata.json")
 
 print("\n✅ Section 7 Complete!")
-print(f"   Created {sv_df['trackId'].nunique()} tracks from {len(sv_df)} observations")
+print(f"   Created {len(track_sizes)} tracks from {len(sv_df)} observations")
 print(f"   Ready to proceed to Section 8 (Tier-Based Routing)")
 print("="*80)
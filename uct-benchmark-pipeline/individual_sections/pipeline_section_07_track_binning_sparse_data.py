@@ -2,8 +2,10 @@
 SECTION 7: TRACK BINNING (For Sparse State Vector Data)
 For sparse data like state vectors, skip track filtering
 """
-import json
-import pandas as pd
+import numpy as np
+
+import pipeline_state
+import tracks
 
 print("="*80)
 print("SECTION 7: TRACK BINNING (SPARSE DATA MODE)")
@@ -11,8 +13,9 @@ print("="*80)
 
 # Load validated data
 print("\n📥 Loading validated data from Section 6...")
-sv_df = pd.read_csv('pipeline_validated_data.csv')
-sv_df['epoch'] = pd.to_datetime(sv_df['epoch'])
+sv_df = pipeline_state.load_frame('pipeline_validated_data.parquet')
+
+config = pipeline_state.load('pipeline_config.json')
 
 print(f"   ✅ Loaded {len(sv_df)} validated state vectors")
 
@@ -25,40 +28,22 @@ print(f"   Proceeding WITHOUT track filtering for sparse data")
 # Simple track assignment based on time gaps (for metadata only)
 print(f"\n📊 Assigning Track IDs (for metadata, not filtering):")
 
-sv_df = sv_df.sort_values(['satNo', 'epoch']).reset_index(drop=True)
-sv_df['trackId'] = None
-current_track_id = 1
-
-for sat in sv_df['satNo'].unique():
-    sat_mask = sv_df['satNo'] == sat
-    sat_indices = sv_df[sat_mask].index
-    
-    # Assign track IDs based on gaps
-    sv_df.loc[sat_indices[0], 'trackId'] = current_track_id
-    current_sat_track = current_track_id
-    
-    for i in range(1, len(sat_indices)):
-        prev_idx = sat_indices[i-1]
-        curr_idx = sat_indices[i]
-        
-        time_gap = (sv_df.loc[curr_idx, 'epoch'] - sv_df.loc[prev_idx, 'epoch']).total_seconds() / 3600
-        
-        if time_gap > 6.0:  # 6-hour gap for GEO
-            current_track_id += 1
-            current_sat_track = current_track_id
-        
-        sv_df.loc[curr_idx, 'trackId'] = current_sat_track
-    
-    current_track_id += 1
-
-sv_df['trackId'] = sv_df['trackId'].astype(int)
+sv_df = sv_df.sort_values(['satNo', 'epoch'], kind='stable', ignore_index=True)
+
+# New track at each satellite's first observation or after a gap > 6 hours (GEO)
+gap_hours = tracks.gap_hours(sv_df)
+new_track = np.isnan(gap_hours) | (gap_hours > 6.0)
+sv_df['trackId'] = np.cumsum(new_track, dtype=np.int32)
+
+# Observations per (satellite, track), reused by every summary below
+track_sizes = sv_df.groupby(['satNo', 'trackId']).size()
 
 print(f"   ✅ Assigned track IDs to {len(sv_df)} observations")
-print(f"   Total tracks: {sv_df['trackId'].nunique()}")
+print(f"   Total tracks: {len(track_sizes)}")
 
 # Gap analysis
 print(f"\n📊 Gap Analysis:")
-sv_df['gap_hours'] = sv_df.groupby('satNo')['epoch'].diff().dt.total_seconds() / 3600
+sv_df['gap_hours'] = gap_hours
 
 gaps = sv_df['gap_hours'].dropna()
 if len(gaps) > 0:
@@ -69,23 +54,29 @@ if len(gaps) > 0:
 
 # Per-satellite summary
 print(f"\n📊 Per-Satellite Summary:")
-for sat in sorted(sv_df['satNo'].unique()):
-    sat_data = sv_df[sv_df['satNo'] == sat]
+sat_summary = track_sizes.groupby(level='satNo').agg(n_obs='sum', n_tracks='size')
+sat_span = sv_df.groupby('satNo')['epoch'].agg(['min', 'max'])
+for sat, row in sat_summary.iterrows():
     print(f"   Satellite {sat}:")
-    print(f"      Observations: {len(sat_data)}")
-    print(f"      Tracks: {sat_data['trackId'].nunique()}")
-    print(f"      Time span: {(sat_data['epoch'].max() - sat_data['epoch'].min()).days} days")
+    print(f"      Observations: {row['n_obs']}")
+    print(f"      Tracks: {row['n_tracks']}")
+    print(f"      Time span: {(sat_span.at[sat, 'max'] - sat_span.at[sat, 'min']).days} days")
 
 # Save data (keeping ALL observations - no filtering)
 print(f"\n📦 Saving track-labeled data (NO FILTERING APPLIED)...")
 
-sv_df.to_csv('pipeline_binned_data.csv', index=False)
-print(f"   ✅ Data saved to pipeline_binned_data.csv")
+# Section 9 reads this file, so it is written even from run_sections_6_to_8.py
+pipeline_state.save_frame('pipeline_binned_data.parquet', sv_df, checkpoint=True)
+print(f"   ✅ Data saved to pipeline_binned_data.parquet")
+
+if config.get('export_csv', False):
+    sv_df.to_csv('pipeline_binned_data.csv', index=False)
+    print(f"   ✅ Data also exported to pipeline_binned_data.csv")
 
 binning_metadata = {
     'input_observations': len(sv_df),
     'output_observations': len(sv_df),
-    'tracks_created': int(sv_df['trackId'].nunique()),
+    'tracks_created': len(track_sizes),
     'filtering_applied': False,
     'reason': 'Sparse state vector data - track filtering skipped',
     'has_track_ids': True,
@@ -93,15 +84,13 @@ binning_metadata = {
     'per_satellite': {}
 }
 
-for sat in sv_df['satNo'].unique():
-    sat_data = sv_df[sv_df['satNo'] == sat]
+for sat, row in sat_summary.iterrows():
     binning_metadata['per_satellite'][int(sat)] = {
-        'tracks': int(sat_data['trackId'].nunique()),
-        'observations': int(len(sat_data))
+        'tracks': int(row['n_tracks']),
+        'observations': int(row['n_obs'])
     }
 
-with open('pipeline_binning_metadata.json', 'w') as f:
-    json.dump(binning_metadata, f, indent=2)
+pipeline_state.save('pipeline_binning_metadata.json', binning_metadata)
 
 print(f"   ✅ Binning metadata saved")
 
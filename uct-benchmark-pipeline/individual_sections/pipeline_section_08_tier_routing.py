@@ -2,8 +2,8 @@
 SECTION 8: TIER-BASED ROUTING
 Determines processing path based on quality tier (T1/T2/T3/T4)
 """
-import json
-import pandas as pd
+
+import pipeline_state
 
 print("="*80)
 print("SECTION 8: TIER-BASED ROUTING")
@@ -11,11 +11,9 @@ print("="*80)
 
 # Load configuration and binned data
 print("\n📥 Loading previous sections...")
-with open('pipeline_config.json', 'r') as f:
-    config = json.load(f)
+config = pipeline_state.load('pipeline_config.json')
 
-binned_df = pd.read_csv('pipeline_binned_data.csv')
-binned_df['epoch'] = pd.to_datetime(binned_df['epoch'])
+binned_df = pipeline_state.load_frame('pipeline_binned_data.parquet')
 
 print(f"   ✅ Configuration loaded: Tier {config['quality_tier']}")
 print(f"   ✅ Binned data loaded: {len(binned_df)} observations")
@@ -104,11 +102,12 @@ else:  # T3 or T4
 
 # Check current data volume against tier limits
 print(f"\n📊 Data Volume Check:")
-for sat in binned_df['satNo'].unique():
-    sat_obs = len(binned_df[binned_df['satNo'] == sat])
-    max_allowed = tier_config['max_obs_per_sat']
-    
-    if sat_obs > max_allowed:
+max_allowed = tier_config['max_obs_per_sat']
+sat_counts = binned_df.groupby('satNo', sort=False).size()
+exceeds = sat_counts > max_allowed
+
+for sat, sat_obs in sat_counts.items():
+    if exceeds[sat]:
         print(f"   Satellite {sat}: {sat_obs} obs > {max_allowed} limit")
         print(f"      ⚠️ Downsampling REQUIRED")
     else:
@@ -128,20 +127,20 @@ routing_data = {
     },
     'current_data': {
         'observations': len(binned_df),
-        'satellites': binned_df['satNo'].unique().tolist(),
+        'satellites': sat_counts.index.tolist(),
         'per_satellite': {}
     }
 }
 
-for sat in binned_df['satNo'].unique():
-    sat_obs = len(binned_df[binned_df['satNo'] == sat])
-    routing_data['current_data']['per_satellite'][int(sat)] = {
-        'observations': int(sat_obs),
-        'exceeds_limit': sat_obs > tier_config['max_obs_per_sat']
+# tolist() gives plain Python ints and bools, which the stdlib json fallback needs
+for sat, sat_obs, over_limit in zip(sat_counts.index.tolist(), sat_counts.tolist(), exceeds.tolist()):
+    routing_data['current_data']['per_satellite'][sat] = {
+        'observations': sat_obs,
+        'exceeds_limit': over_limit
     }
 
-with open('pipeline_routing.json', 'w') as f:
-    json.dump(routing_data, f, indent=2)
+# Sections 9 and 10 read this file, so it is written even from run_sections_6_to_8.py
+pipeline_state.save('pipeline_routing.json', routing_data, checkpoint=True)
 
 print(f"   ✅ Routing data saved to pipeline_routing.json")
 
@@ -2,21 +2,22 @@
 SECTION 9: DOWNSAMPLING
 Reduces observation density to meet tier requirements
 """
-import json
 import pandas as pd
 import numpy as np
 
+import pipeline_state
+import tracks
+
 print("="*80)
 print("SECTION 9: DOWNSAMPLING")
 print("="*80)
 
 # Load previous sections
 print("\n📥 Loading previous sections...")
-binned_df = pd.read_csv('pipeline_binned_data.csv')
-binned_df['epoch'] = pd.to_datetime(binned_df['epoch'])
+binned_df = pipeline_state.load_frame('pipeline_binned_data.parquet')
 
-with open('pipeline_routing.json', 'r') as f:
-    routing = json.load(f)
+routing = pipeline_state.load('pipeline_routing.json')
+config = pipeline_state.load('pipeline_config.json')
 
 tier_config = routing['tier_config']
 max_obs = tier_config['max_obs_per_sat']
@@ -32,49 +33,46 @@ print(f"   1. Calculate required reduction ratio")
 print(f"   2. Sample uniformly across time range")
 print(f"   3. Preserve first and last observations")
 
-downsampled_data = []
-
-for sat in sorted(binned_df['satNo'].unique()):
-    sat_data = binned_df[binned_df['satNo'] == sat].copy()
-    sat_data = sat_data.sort_values('epoch').reset_index(drop=True)
-    
-    current_count = len(sat_data)
-    
-    print(f"\n   Satellite {sat}:")
-    print(f"      Current: {current_count} observations")
-    print(f"      Limit: {max_obs} observations")
-    
-    if current_count > max_obs:
-        # Need to downsample
-        print(f"      ⚠️ Exceeds limit by {current_count - max_obs}")
-        
-        # Calculate sampling rate
-        # Keep max_obs observations uniformly distributed
-        indices_to_keep = np.linspace(0, len(sat_data) - 1, max_obs, dtype=int)
-        
-        # Ensure we keep first and last
-        indices_to_keep = np.unique(indices_to_keep)
-        
-        sat_downsampled = sat_data.iloc[indices_to_keep].copy()
-        
-        print(f"      ✅ Downsampled to {len(sat_downsampled)} observations")
-        print(f"      Retention: {len(sat_downsampled)/current_count*100:.1f}%")
-        
-        # Calculate new gaps
-        sat_downsampled_sorted = sat_downsampled.sort_values('epoch')
-        gaps = sat_downsampled_sorted['epoch'].diff().dt.total_seconds() / 3600
-        
-        print(f"      New mean gap: {gaps.mean():.1f} hours")
-        print(f"      New max gap: {gaps.max():.1f} hours")
+# One sort up front makes every satellite a contiguous block of rows, so
+# downsampling only has to pick row positions within each block
+binned_df = binned_df.sort_values(['satNo', 'epoch'], kind='stable', ignore_index=True)
+counts = binned_df.groupby('satNo').size()
+sizes = counts.to_numpy()
+starts = np.cumsum(sizes) - sizes
+
+# Row positions to keep, for all satellites at once: the first min(n, max_obs)
+# slots of each block, stretched over the block as np.linspace(0, n - 1,
+# max_obs) does for satellites over the limit
+kept = np.minimum(sizes, max_obs)
+kept_ends = np.cumsum(kept)
+group = np.repeat(np.arange(len(sizes)), kept)
+slot = np.arange(kept_ends[-1]) - np.repeat(kept_ends - kept, kept)
+step = np.where(sizes > max_obs, (sizes - 1) / (max_obs - 1), 1.0)
+within = (slot * step[group]).astype(np.int64)
+within[kept_ends - 1] = sizes - 1  # last observation always kept, as linspace's endpoint
+
+# All satellites in a single take
+downsampled_df = binned_df.iloc[starts[group] + within].reset_index(drop=True)
+downsampled_df['gap_hours'] = tracks.gap_hours(downsampled_df)
+
+# One summary line; the per-satellite walk-through only on request
+over_limit = sizes > max_obs
+print(f"\n   {over_limit.sum()}/{len(sizes)} satellites exceed {max_obs} observations and were downsampled")
+if config.get('verbose', False):
+    new_gaps = downsampled_df.groupby('satNo')['gap_hours'].agg(['mean', 'max'])
+    for sat, current_count, final_count in zip(counts.index, sizes, kept):
+        print(f"\n   Satellite {sat}:")
+        print(f"      Current: {current_count} observations")
+        print(f"      Limit: {max_obs} observations")
         
-        downsampled_data.append(sat_downsampled)
-    else:
-        # Already within limit
-        print(f"      ✅ Already within limit, no downsampling needed")
-        downsampled_data.append(sat_data)
-
-# Combine all satellites
-downsampled_df = pd.concat(downsampled_data, ignore_index=True)
+        if current_count > max_obs:
+            print(f"      ⚠️ Exceeds limit by {current_count - max_obs}")
+            print(f"      ✅ Downsampled to {final_count} observations")
+            print(f"      Retention: {final_count/current_count*100:.1f}%")
+            print(f"      New mean gap: {new_gaps.at[sat, 'mean']:.1f} hours")
+            print(f"      New max gap: {new_gaps.at[sat, 'max']:.1f} hours")
+        else:
+            print(f"      ✅ Already within limit, no downsampling needed")
 
 # Summary
 print(f"\n📊 DOWNSAMPLING SUMMARY:")
@@ -84,17 +82,16 @@ print(f"   Downsampled observations: {len(downsampled_df)}")
 print(f"   Removed: {len(binned_df) - len(downsampled_df)}")
 print(f"   Retention rate: {len(downsampled_df)/len(binned_df)*100:.1f}%")
 
+# Observations per satellite after downsampling; counts holds them before
+final_counts = downsampled_df['satNo'].value_counts(sort=False).sort_index()
+
 print(f"\n   Per-Satellite Results:")
-for sat in sorted(downsampled_df['satNo'].unique()):
-    original = len(binned_df[binned_df['satNo'] == sat])
-    final = len(downsampled_df[downsampled_df['satNo'] == sat])
+for sat, final in final_counts.items():
+    original = counts[sat]
     print(f"      Satellite {sat}: {original} → {final} observations")
 
 # Gap analysis after downsampling
 print(f"\n📊 Gap Analysis After Downsampling:")
-downsampled_df = downsampled_df.sort_values(['satNo', 'epoch'])
-downsampled_df['gap_hours'] = downsampled_df.groupby('satNo')['epoch'].diff().dt.total_seconds() / 3600
-
 gaps = downsampled_df['gap_hours'].dropna()
 if len(gaps) > 0:
     print(f"   Mean gap: {gaps.mean():.1f} hours")
@@ -105,8 +102,14 @@ if len(gaps) > 0:
 # Save downsampled data
 print(f"\n📦 Saving downsampled data...")
 
-downsampled_df.to_csv('pipeline_downsampled_data.csv', index=False)
-print(f"   ✅ Data saved to pipeline_downsampled_data.csv")
+# Parquet keeps the epochs as datetimes, so Sections 10 and 11 read them back
+# without parsing text
+pipeline_state.save_frame('pipeline_downsampled_data.parquet', downsampled_df)
+print(f"   ✅ Data saved to pipeline_downsampled_data.parquet")
+
+if config.get('export_csv', False):
+    downsampled_df.to_csv('pipeline_downsampled_data.csv', index=False)
+    print(f"   ✅ Data also exported to pipeline_downsampled_data.csv")
 
 downsampling_metadata = {
     'original_count': len(binned_df),
@@ -118,17 +121,13 @@ downsampling_metadata = {
     'per_satellite': {}
 }
 
-for sat in downsampled_df['satNo'].unique():
-    original = len(binned_df[binned_df['satNo'] == sat])
-    final = len(downsampled_df[downsampled_df['satNo'] == sat])
-    downsampling_metadata['per_satellite'][int(sat)] = {
-        'original': int(original),
-        'final': int(final),
-        'removed': int(original - final)
-    }
-
-with open('pipeline_downsampling_metadata.json', 'w') as f:
-    json.dump(downsampling_metadata, f, indent=2)
+per_sat = pd.DataFrame({'original': counts, 'final': final_counts})
+per_sat['removed'] = per_sat['original'] - per_sat['final']
+downsampling_metadata['per_satellite'] = {
+    int(sat): sat_counts for sat, sat_counts in per_sat.to_dict(orient='index').items()
+}
+
+pipeline_state.save('pipeline_downsampling_metadata.json', downsampling_metadata)
 
 print(f"   ✅ Downsampling metadata saved")
 
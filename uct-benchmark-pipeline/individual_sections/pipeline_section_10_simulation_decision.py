@@ -2,8 +2,7 @@
 SECTION 10: SIMULATION DECISION
 Determines if simulation should run based on data characteristics
 """
-import json
-import pandas as pd
+import pipeline_state
 
 print("="*80)
 print("SECTION 10: SIMULATION DECISION")
@@ -11,17 +10,13 @@ print("="*80)
 
 # Load previous sections
 print("\n📥 Loading previous sections...")
-downsampled_df = pd.read_csv('pipeline_downsampled_data.csv')
-downsampled_df['epoch'] = pd.to_datetime(downsampled_df['epoch'])
+downsampled_df = pipeline_state.load_frame('pipeline_downsampled_data.parquet', columns=['satNo', 'epoch'])
 
-with open('pipeline_routing.json', 'r') as f:
-    routing = json.load(f)
-
-with open('pipeline_regimes.json', 'r') as f:
-    regimes = json.load(f)
+routing = pipeline_state.load('pipeline_routing.json')
+config = pipeline_state.load('pipeline_config.json')
 
 # Load TLE data for period calculation
-tle_df = pd.read_csv('data/referenceTLEs_.csv')
+tle_df = pipeline_state.load_reference('data/referenceTLEs_.csv', columns=['satNo', 'meanMotion'])
 
 print(f"   ✅ Loaded {len(downsampled_df)} downsampled observations")
 print(f"   Tier: {routing['tier']} ({routing['tier_name']})")
@@ -42,35 +37,41 @@ print(f"   2. Minimum observations: {'✅ Pass' if has_min_obs else '❌ Fail'}
 # Check orbital period coverage for each satellite
 print(f"\n   3. Orbital Period Coverage Check:")
 
-period_coverage_ok = True
-for sat in downsampled_df['satNo'].unique():
-    sat_data = downsampled_df[downsampled_df['satNo'] == sat]
-    
-    # Get orbital period from TLE
-    sat_tle = tle_df[tle_df['satNo'] == sat]
-    if len(sat_tle) > 0:
-        mean_motion = sat_tle.iloc[0]['meanMotion']  # rev/day
-        period_hours = 24 / mean_motion
-        
-        # Calculate time span of observations
-        time_span = sat_data['epoch'].max() - sat_data['epoch'].min()
-        time_span_hours = time_span.total_seconds() / 3600
-        
-        periods_covered = time_span_hours / period_hours
-        
-        print(f"      Satellite {sat}:")
-        print(f"         Orbital period: {period_hours:.2f} hours")
-        print(f"         Time span: {time_span_hours:.1f} hours")
-        print(f"         Periods covered: {periods_covered:.2f}")
-        
-        if periods_covered >= 1.0:
+# Orbital period (first TLE per satellite, rev/day) against the time span of
+# observations, for every satellite at once
+mean_motions = tle_df.drop_duplicates('satNo').set_index('satNo')['meanMotion']
+coverage = downsampled_df.groupby('satNo', sort=False)['epoch'].agg(['min', 'max'])
+coverage['span_hours'] = (coverage['max'] - coverage['min']).dt.total_seconds() / 3600
+coverage['period_hours'] = 24 / coverage.index.map(mean_motions)
+coverage['periods_covered'] = coverage['span_hours'] / coverage['period_hours']
+
+# Satellites without a TLE have a NaN period and never count as covered
+has_tle = coverage.index.isin(mean_motions.index)
+sufficient = (coverage['periods_covered'] >= 1.0).to_numpy()
+period_coverage_ok = bool(sufficient.all())
+
+# One summary line; the per-satellite list only on request
+print(f"      {sufficient.sum()}/{len(coverage)} satellites cover ≥1.0 orbital period")
+if config.get('verbose', False):
+    for row, tle_found, covered in zip(coverage.itertuples(), has_tle, sufficient):
+        if not tle_found:
+            print(f"      Satellite {row.Index}: ❌ No TLE data")
+            continue
+        print(f"      Satellite {row.Index}:")
+        print(f"         Orbital period: {row.period_hours:.2f} hours")
+        print(f"         Time span: {row.span_hours:.1f} hours")
+        print(f"         Periods covered: {row.periods_covered:.2f}")
+        if covered:
             print(f"         ✅ Sufficient coverage (≥1.0 period)")
         else:
             print(f"         ❌ Insufficient coverage (<1.0 period)")
-            period_coverage_ok = False
-    else:
-        print(f"      Satellite {sat}: ❌ No TLE data")
-        period_coverage_ok = False
+else:
+    no_tle = coverage.index[~has_tle].tolist()
+    if no_tle:
+        print(f"      ❌ No TLE data: {no_tle}")
+    short = coverage.index[has_tle & ~sufficient].tolist()
+    if short:
+        print(f"      ❌ Insufficient coverage (<1.0 period): {short}")
 
 # Overall decision
 print(f"\n🎯 SIMULATION DECISION:")
@@ -121,11 +122,10 @@ decision_data = {
         'period_coverage_ok': period_coverage_ok
     },
     'input_observations': len(downsampled_df),
-    'satellites': downsampled_df['satNo'].unique().tolist()
+    'satellites': coverage.index.tolist()  # first-appearance order, as unique()
 }
 
-with open('pipeline_simulation_decision.json', 'w') as f:
-    json.dump(decision_data, f, indent=2)
+pipeline_state.save('pipeline_simulation_decision.json', decision_data)
 
 print(f"   ✅ Decision saved to pipeline_simulation_decision.json")
 
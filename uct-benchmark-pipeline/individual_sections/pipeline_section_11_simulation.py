@@ -2,8 +2,8 @@
 SECTION 11: SIMULATION PIPELINE
 PATRICK'S CORE WORK - Gap detection and synthetic observation generation
 """
-import json
-import pandas as pd
+import pipeline_state
+import tracks
 
 print("="*80)
 print("SECTION 11: SIMULATION PIPELINE")
@@ -12,15 +12,15 @@ print("="*80)
 
 # Load previous sections
 print("\n📥 Loading previous sections...")
-downsampled_df = pd.read_csv('pipeline_downsampled_data.csv')
-downsampled_df['obTime'] = pd.to_datetime(downsampled_df['epoch'])
+obs_columns = ['satNo', 'epoch', 'idSensor', 'senlat', 'senlon', 'senalt', 'ra', 'declination']
+downsampled_df = pipeline_state.load_frame('pipeline_downsampled_data.parquet', columns=obs_columns)
+downsampled_df['obTime'] = downsampled_df['epoch']
 
-with open('pipeline_simulation_decision.json', 'r') as f:
-    sim_decision = json.load(f)
+sim_decision = pipeline_state.load('pipeline_simulation_decision.json')
 
 # Load TLE and sensor data
-tle_df = pd.read_csv('data/referenceTLEs_.csv')
-sensor_df = pd.read_csv('data/sensorCounts.csv')
+tle_df = pipeline_state.load_reference('data/referenceTLEs_.csv')
+sensor_df = pipeline_state.load_reference('data/sensorCounts.csv')
 
 print(f"   ✅ Input observations: {len(downsampled_df)}")
 print(f"   ✅ Satellites: {sorted(downsampled_df['satNo'].unique())}")
@@ -39,6 +39,25 @@ from uct_benchmark.data.dataManipulation import apply_simulation_to_gaps
 # Apply simulation (Patrick's core work)
 result_df, metadata = apply_simulation_to_gaps(obs_df, tle_df, sensor_df)
 
+# Real/simulated counts and post-simulation gaps per satellite, from one
+# sorted copy of just the needed columns and one groupby. The flags are summed
+# as int8 there, leaving result_df (and the saved True/False column) as is;
+# a null flag counts as neither real nor simulated
+result_sorted = (result_df[['satNo', 'obTime', 'is_simulated']]
+                 .sort_values(['satNo', 'obTime'], kind='stable', ignore_index=True))
+flag = result_sorted['is_simulated']
+result_sorted['is_simulated'] = flag.eq(True).fillna(False).astype('int8')
+result_sorted['is_real'] = flag.eq(False).fillna(False).astype('int8')
+result_sorted['gap'] = tracks.gap_hours(result_sorted, time_col='obTime')
+sat_stats = result_sorted.groupby('satNo').agg(
+    total=('is_simulated', 'size'),
+    simulated=('is_simulated', 'sum'),
+    real=('is_real', 'sum'),
+    gap_count=('gap', 'count'),
+    gap_mean=('gap', 'mean'),
+    gap_max=('gap', 'max')
+)
+
 print(f"\n📊 SIMULATION RESULTS:")
 print("="*80)
 print(f"   Original observations: {metadata['original_count']}")
@@ -53,27 +72,19 @@ if metadata['simulated_count'] > 0:
     
     # Per-satellite breakdown
     print(f"\n📊 Per-Satellite Results:")
-    for sat in sorted(result_df['satNo'].unique()):
-        sat_all = result_df[result_df['satNo'] == sat]
-        sat_real = sat_all[sat_all['is_simulated'] == False]
-        sat_sim = sat_all[sat_all['is_simulated'] == True]
-        
-        increase = (len(sat_sim) / len(sat_real) * 100) if len(sat_real) > 0 else 0
+    for row in sat_stats.itertuples():
+        increase = (row.simulated / row.real * 100) if row.real > 0 else 0
         
-        print(f"\n      Satellite {sat}:")
-        print(f"         Real observations: {len(sat_real)}")
-        print(f"         Simulated observations: {len(sat_sim)}")
-        print(f"         Total: {len(sat_all)}")
+        print(f"\n      Satellite {row.Index}:")
+        print(f"         Real observations: {row.real}")
+        print(f"         Simulated observations: {row.simulated}")
+        print(f"         Total: {row.total}")
         print(f"         Increase: +{increase:.0f}%")
         
         # Gap analysis
-        sat_sorted = sat_all.sort_values('obTime')
-        sat_sorted['gap'] = sat_sorted['obTime'].diff().dt.total_seconds() / 3600
-        
-        gaps = sat_sorted['gap'].dropna()
-        if len(gaps) > 0:
-            print(f"         Mean gap after sim: {gaps.mean():.1f} hours")
-            print(f"         Max gap after sim: {gaps.max():.1f} hours")
+        if row.gap_count > 0:
+            print(f"         Mean gap after sim: {row.gap_mean:.1f} hours")
+            print(f"         Max gap after sim: {row.gap_max:.1f} hours")
     
     # Save results
     output_path = 'pipeline_simulation_results.csv'
@@ -94,22 +105,16 @@ simulation_metadata = {
     'synthetic_ratio': metadata['synthetic_ratio'],
     'satellites_processed': metadata['satellites_processed'],
     'satellites_failed': metadata['satellites_failed'],
-    'per_satellite': {}
-}
-
-for sat in result_df['satNo'].unique():
-    sat_all = result_df[result_df['satNo'] == sat]
-    sat_real = sat_all[sat_all['is_simulated'] == False]
-    sat_sim = sat_all[sat_all['is_simulated'] == True]
-    
-    simulation_metadata['per_satellite'][int(sat)] = {
-        'real': int(len(sat_real)),
-        'simulated': int(len(sat_sim)),
-        'total': int(len(sat_all))
+    'per_satellite': {
+        int(sat): counts
+        # in result_df's first-appearance order, like the report before
+        for sat, counts in (sat_stats.reindex(result_df['satNo'].unique())
+                            [['real', 'simulated', 'total']].to_dict(orient='index').items())
     }
+}
 
-with open('pipeline_simulation_metadata.json', 'w') as f:
-    json.dump(simulation_metadata, f, indent=2)
+# Final output, so it is written even from run_sections_9_to_11.py
+pipeline_state.save('pipeline_simulation_metadata.json', simulation_metadata, checkpoint=True)
 
 print(f"   ✅ Simulation metadata saved")
 
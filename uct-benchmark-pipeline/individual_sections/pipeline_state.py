@@ -0,0 +1,120 @@
+"""
+PIPELINE STATE
+Hands section outputs to the next section in memory, with JSON (or, for
+data frames, Parquet) checkpoints
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json gives the same files, slower
+    orjson = None
+
+# Section outputs keyed by their checkpoint file name
+_state = {}
+
+# Parsed checkpoint files keyed by (path, mtime), so re-running a section in
+# the same interpreter (e.g. a notebook) skips the re-parse until the file
+# actually changes
+_file_cache = {}
+
+# Each section run as its own script needs the file left by the one before
+# it, so checkpoints are on by default. run_sections_1_to_5.py,
+# run_sections_6_to_8.py and run_sections_9_to_11.py run their sections in
+# one process and switch them off.
+CHECKPOINT = os.getenv('PIPELINE_CHECKPOINT', '1') != '0'
+
+
+def save(name, data, checkpoint=None):
+    """Keep a section's output in memory and, if checkpointing, on disk.
+
+    Pass checkpoint=True for files read by sections outside the driver.
+    """
+    _state[name] = data
+    if not (CHECKPOINT if checkpoint is None else checkpoint):
+        return
+    if orjson is not None:
+        # regime dicts are keyed by int satNo, which json.dump stringifies;
+        # numpy floats (e.g. in simulation metadata) are floats to json.dump
+        with open(name, 'wb') as f:
+            f.write(orjson.dumps(
+                data,
+                option=(orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                        | orjson.OPT_SERIALIZE_NUMPY)
+            ))
+    else:
+        with open(name, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def load(name):
+    """Return a previous section's output, from memory if it ran here."""
+    if name in _state:
+        return _state[name]
+    return load_json_cached(name)
+
+
+def save_frame(name, df, checkpoint=None):
+    """save() for a DataFrame: the checkpoint file is Parquet instead of JSON."""
+    _state[name] = df
+    if not (CHECKPOINT if checkpoint is None else checkpoint):
+        return
+    df.to_parquet(name, index=False, compression='zstd')
+
+
+def load_frame(name, columns=None):
+    """Return a previous section's DataFrame, from memory if it ran here.
+
+    columns, if given, selects just those columns (only they are read from
+    a Parquet checkpoint).
+    """
+    if name in _state:
+        df = _state[name]
+        return df if columns is None else df[columns]
+    import pandas as pd
+    return pd.read_parquet(name, columns=columns)
+
+
+def load_reference(path, columns=None):
+    """pd.read_csv(path) for a reference table (TLEs, sensors), via a Parquet
+    mirror at path + '.parquet'.
+
+    The mirror is rebuilt whenever the CSV is newer, so warm runs skip the CSV
+    parse; within one interpreter the frame is reused until the CSV changes.
+    If the mirror can't be written (read-only data/, mixed-type columns) the
+    CSV frame is used as is. Callers get a copy, so changing it in place
+    doesn't reach later callers.
+    """
+    import pandas as pd
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _file_cache:
+        mirror = path + '.parquet'
+        if os.path.exists(mirror) and os.stat(mirror).st_mtime_ns >= key[1]:
+            _file_cache[key] = pd.read_parquet(mirror, memory_map=True)
+        else:
+            df = pd.read_csv(path)
+            try:
+                df.to_parquet(mirror, index=False, compression='zstd')
+            except (OSError, TypeError, ValueError):
+                # don't leave a half-written mirror that looks up to date
+                try:
+                    os.remove(mirror)
+                except OSError:
+                    pass
+            _file_cache[key] = df
+    df = _file_cache[key]
+    return df.copy() if columns is None else df[columns].copy()
+
+
+def load_json_cached(path):
+    """json.load(path), reusing the last parse while the file is unchanged."""
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _file_cache:
+        if orjson is not None:
+            with open(path, 'rb') as f:
+                _file_cache[key] = orjson.loads(f.read())
+        else:
+            with open(path, 'r') as f:
+                _file_cache[key] = json.load(f)
+    return _file_cache[key]
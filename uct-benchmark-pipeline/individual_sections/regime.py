@@ -0,0 +1,82 @@
+"""
+ORBITAL REGIME CLASSIFICATION
+Vectorized regime rules shared by both Section 3 scripts
+
+Rules:
+- HEO: eccentricity >= 0.7
+- LEO: SMA < 8,378 km
+- GEO: SMA >= 42,164 km
+- MEO: everything else
+"""
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+MU_EARTH = 398600.4418  # km³/s², Earth's gravitational parameter
+
+
+def classify(tle_df, sat_ids):
+    """
+    Classify each satellite from its first TLE row.
+
+    Returns (regimes, regime_details), both keyed by satellite number.
+    Satellites without a TLE row are NO_TLE; a zero or unparseable mean
+    motion gives UNKNOWN.
+    """
+    first_tle = tle_df[tle_df['satNo'].isin(sat_ids)].drop_duplicates('satNo')
+
+    # Semi-Major Axis from mean motion via Kepler's 3rd law: T^2 = (4π^2/μ) * a^3
+    raw_mm = first_tle['meanMotion']
+    mean_motion = pd.to_numeric(raw_mm, errors='coerce').to_numpy(dtype=np.float64)  # rev/day
+    n = mean_motion * (2 * np.pi) / 86400  # rad/s
+    with np.errstate(divide='ignore'):
+        sma = (MU_EARTH / (n**2)) ** (1/3)  # km
+
+    # Eccentricity: unparseable values count as circular, missing ones stay NaN
+    raw_ecc = first_tle['eccentricity']
+    ecc = pd.to_numeric(raw_ecc, errors='coerce')
+    ecc = ecc.mask(ecc.isna() & raw_ecc.notna(), 0.0).to_numpy(dtype=np.float64)
+
+    regime = np.select([ecc >= 0.7, sma < 8378, sma >= 42164], ['HEO', 'LEO', 'GEO'], default='MEO')
+
+    # A zero or unparseable mean motion has no SMA
+    unknown = (mean_motion == 0) | (np.isnan(mean_motion) & raw_mm.notna().to_numpy())
+    regime = np.where(unknown, 'UNKNOWN', regime)
+    sma = np.where(unknown, 0.0, sma)
+    ecc = np.where(unknown, 0.0, ecc)
+    mean_motion = np.where(unknown, 0.0, mean_motion)
+    with np.errstate(divide='ignore'):
+        period_hours = np.where(mean_motion > 0, (24 * 60) / mean_motion / 60, 0.0)
+
+    by_sat = dict(zip(
+        first_tle['satNo'].tolist(),
+        zip(regime.tolist(), sma.tolist(), ecc.tolist(), period_hours.tolist(), mean_motion.tolist())
+    ))
+
+    regimes = {}
+    regime_details = {}
+    for sat in sat_ids:
+        if sat in by_sat:
+            regime_name, sma_km, eccentricity, period, mm = by_sat[sat]
+            regime_details[sat] = {
+                'regime': regime_name,
+                'sma_km': sma_km,
+                'eccentricity': eccentricity,
+                'period_hours': period,
+                'mean_motion': mm
+            }
+        else:
+            regime_name = 'NO_TLE'
+            regime_details[sat] = {'regime': 'NO_TLE'}
+        regimes[sat] = regime_name
+
+    return regimes, regime_details
+
+
+def primary_regime(regime_counts, default='GEO'):
+    """Most common classified regime (first seen on a tie), or default if none."""
+    valid = Counter({r: n for r, n in regime_counts.items() if r not in ['NO_TLE', 'UNKNOWN']})
+    if valid:
+        return valid.most_common(1)[0][0]
+    return default
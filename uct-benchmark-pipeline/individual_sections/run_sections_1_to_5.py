@@ -0,0 +1,31 @@
+"""
+SECTIONS 1-5: CONFIGURATION THROUGH API QUERY
+Runs sections 1-5 in one process, passing their outputs along in memory
+
+Usage:
+    python individual_sections/run_sections_1_to_5.py [--checkpoint]
+
+With --checkpoint every intermediate pipeline_*.json file is written as
+when the sections are run one by one. Without it only the files read by
+Sections 6-11 are saved: pipeline_config.json, pipeline_state_vectors.parquet
+and pipeline_query_metadata.json.
+"""
+import os
+import runpy
+import sys
+
+import pipeline_state
+
+SECTIONS = [
+    'pipeline_section_01_configuration.py',
+    'pipeline_section_02_authentication.py',
+    'pipeline_section_03_regime_detection_fixed.py',
+    'pipeline_section_04_search_strategy.py',
+    'pipeline_section_05_api_query.py',
+]
+
+pipeline_state.CHECKPOINT = '--checkpoint' in sys.argv
+
+here = os.path.dirname(os.path.abspath(__file__))
+for section in SECTIONS:
+    runpy.run_path(os.path.join(here, section), run_name='__main__')
@@ -0,0 +1,28 @@
+"""
+SECTIONS 6-8: DEDUPLICATION THROUGH TIER ROUTING
+Runs sections 6-8 in one process, passing the data frames along in memory
+
+Usage:
+    python individual_sections/run_sections_6_to_8.py [--checkpoint]
+
+With --checkpoint the validated data and the validation/binning metadata are
+written as when the sections are run one by one. Without it only the files
+read by Section 9 onwards (binned data, routing decision) are saved.
+"""
+import os
+import runpy
+import sys
+
+import pipeline_state
+
+SECTIONS = [
+    'pipeline_section_06_deduplication.py',
+    'pipeline_section_07_track_binning_sparse_data.py',
+    'pipeline_section_08_tier_routing.py',
+]
+
+pipeline_state.CHECKPOINT = '--checkpoint' in sys.argv
+
+here = os.path.dirname(os.path.abspath(__file__))
+for section in SECTIONS:
+    runpy.run_path(os.path.join(here, section), run_name='__main__')
@@ -0,0 +1,28 @@
+"""
+SECTIONS 9-11: DOWNSAMPLING THROUGH SIMULATION
+Runs sections 9-11 in one process, passing the data frames along in memory
+
+Usage:
+    python individual_sections/run_sections_9_to_11.py [--checkpoint]
+
+With --checkpoint the downsampled data, the downsampling metadata and the
+simulation decision are written as when the sections are run one by one.
+Without it only the final outputs (simulation results and metadata) are saved.
+"""
+import os
+import runpy
+import sys
+
+import pipeline_state
+
+SECTIONS = [
+    'pipeline_section_09_downsampling.py',
+    'pipeline_section_10_simulation_decision.py',
+    'pipeline_section_11_simulation_fixed.py',
+]
+
+pipeline_state.CHECKPOINT = '--checkpoint' in sys.argv
+
+here = os.path.dirname(os.path.abspath(__file__))
+for section in SECTIONS:
+    runpy.run_path(os.path.join(here, section), run_name='__main__')
@@ -0,0 +1,25 @@
+"""
+TRACK GAPS
+Time gaps between consecutive observations, shared by the Section 7, 9 and
+11 scripts
+"""
+import numpy as np
+
+NS_PER_HOUR = 3.6e12
+
+
+def gap_hours(df, time_col='epoch', by='satNo'):
+    """
+    Hours since the previous row of the same satellite, NaN on each
+    satellite's first row.
+
+    df must be sorted by (by, time_col) with no missing times. Works on the
+    int64 nanosecond view of the timestamps, so there is no groupby and no
+    timedelta conversion.
+    """
+    t = df[time_col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    key = df[by].to_numpy()
+    gaps = np.full(len(df), np.nan)
+    gaps[1:] = (t[1:] - t[:-1]) / NS_PER_HOUR
+    gaps[1:][key[1:] != key[:-1]] = np.nan
+    return gaps
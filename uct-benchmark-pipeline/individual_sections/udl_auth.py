@@ -0,0 +1,75 @@
+"""
+UDL AUTH HELPERS
+Loads .env once per process and caches generated UDL tokens on disk
+"""
+import functools
+import hashlib
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+TOKEN_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'udl', 'token.json')
+# UDL tokens are Basic credentials built from UDL_USERNAME/UDL_PASSWORD and
+# don't expire; the TTL only bounds how long a cached one is reused before it
+# is rebuilt from the current credentials (e.g. after a password change)
+TOKEN_TTL = 3300  # seconds
+
+
+@functools.lru_cache(maxsize=1)
+def ensure_dotenv():
+    """load_dotenv(), searched for and parsed only once per process."""
+    return load_dotenv()
+
+
+def load_cached_token(username, min_remaining=60):
+    """Return the cached token for username, or None if missing or about to expire."""
+    try:
+        with open(TOKEN_CACHE, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('username') != username:
+        return None
+    if cached.get('expires_at', 0) <= time.time() + min_remaining:
+        return None
+    return cached.get('token')
+
+
+def save_cached_token(username, token):
+    """Cache a freshly generated token, readable by the current user only."""
+    os.makedirs(os.path.dirname(TOKEN_CACHE), exist_ok=True)
+    fd = os.open(TOKEN_CACHE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({
+            'username': username,
+            'token': token,
+            'expires_at': time.time() + TOKEN_TTL
+        }, f)
+
+
+def token_fingerprint(token):
+    """Short, non-reversible id for a token, safe to write to pipeline files."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def get_token():
+    """
+    Token for the sections after Section 2: UDL_TOKEN from the environment or
+    .env, else the token Section 2 cached, regenerated from UDL_USERNAME and
+    UDL_PASSWORD (and re-cached) once that entry is missing or stale.
+    """
+    ensure_dotenv()
+    token = os.getenv('UDL_TOKEN')
+    username = os.getenv('UDL_USERNAME')
+    if not token and username:
+        token = load_cached_token(username, min_remaining=0)
+        password = os.getenv('UDL_PASSWORD')
+        if not token and password:
+            from uct_benchmark.api.apiIntegration import UDLTokenGen
+            token = UDLTokenGen(username, password)
+            save_cached_token(username, token)
+    if not token:
+        raise RuntimeError("No UDL token found; set UDL_TOKEN or run Section 2 first")
+    return token
@@ -0,0 +1,58 @@
+"""
+UDL CLIENT HELPERS
+Direct UDL REST calls for lookups the apiIntegration wrappers make expensive
+"""
+import pandas as pd
+import requests
+
+UDL_BASE_URL = 'https://unifieddatalibrary.com/udl/'
+
+
+def udl_headers(token):
+    """Authorization header for a UDL token, with or without its 'Basic ' prefix."""
+    if not token.startswith('Basic '):
+        token = 'Basic ' + token
+    return {'Authorization': token}
+
+
+def udl_probe_count(token, service, params, timeout=60):
+    """
+    Number of records matching params, read from the Content-Range header
+    ('items 0-0/N') of a maxResults=1 request instead of a full count query.
+
+    Raises requests.HTTPError on a rejected request (e.g. a bad token), so
+    the probe doubles as an authentication check.
+    """
+    r = requests.get(
+        UDL_BASE_URL + service,
+        headers=udl_headers(token),
+        params={**params, 'maxResults': 1},
+        timeout=timeout
+    )
+    r.raise_for_status()
+
+    content_range = r.headers.get('Content-Range', '')
+    total = content_range.rsplit('/', 1)[-1]
+    if total.isdigit():
+        return int(total)
+
+    # No usable total in the response; fall back to the server-side count
+    from uct_benchmark.api.apiIntegration import UDLQuery
+    return UDLQuery(token, service, params, count=True)
+
+
+def udl_query_multi(token, service, sat_ids, params, timeout=300):
+    """
+    Records for every satellite in sat_ids from a single request, using UDL's
+    comma-separated satNo filter. Skips asyncUDLBatchQuery's event loop and
+    its dt spacing between requests, which buys nothing for one request.
+    """
+    r = requests.get(
+        UDL_BASE_URL + service,
+        headers=udl_headers(token),
+        params={**params, 'satNo': ','.join(map(str, sat_ids))},
+        timeout=timeout
+    )
+    r.raise_for_status()
+    rows = r.json()
+    return pd.DataFrame(rows if isinstance(rows, list) else rows.get('data', []))